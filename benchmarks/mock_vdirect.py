@@ -0,0 +1,451 @@
+#!/usr/bin/env python
+# (c) 2016, Radware LTD.
+
+# This file is part of Ansible
+#
+# Ansible is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Ansible is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Local stand-in for the vDirect REST API, implementing the endpoints used by the vdirect modules.
+
+It keeps templates, workflow templates, workflows and pending device changes in memory,
+and counts requests and bytes so the benchmark harness can report round trips per scenario.
+
+    python mock_vdirect.py --port 2189 --latency 20 --diff-size 1048576
+
+Control endpoints (no authentication):
+    GET  /_mock/stats   request counters
+    POST /_mock/reset   clear the counters
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import re
+import ssl
+import threading
+import time
+import zipfile
+
+try:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urlparse import urlparse, parse_qs
+except ImportError:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import urlparse, parse_qs
+
+VDIRECT_VERSION = "4.1.0 build 25"
+
+PARAM_PATTERN = re.compile(r"#param\(\$(\w+)\s*,\s*'type=([\w\[\]]+)'(.*)\)")
+WORKFLOW_NAME_PATTERN = re.compile(r"<workflow[^>]*\sname=\"([^\"]+)\"", re.S)
+ACTION_PATTERN = re.compile(r"<action\s+name=\"([^\"]+)\"")
+
+
+class MockState(object):
+    """
+    in memory vDirect content and request statistics
+    """
+
+    def __init__(self, options):
+        self.options = options
+        self.lock = threading.Lock()
+        # session id: last use. kept when the content is cleared
+        self.sessions = {}
+        self.clear()
+        self.reset()
+
+    def clear(self):
+        with self.lock:
+            self.templates = {}
+            self.workflow_templates = {}
+            self.workflows = {}
+            self.pending = {}
+            self.runnables = {}
+
+    def reset(self):
+        with self.lock:
+            self.requests = 0
+            self.logins = 0
+            self.by_endpoint = {}
+            self.bytes_in = 0
+            self.bytes_out = 0
+            self.connections = 0
+
+    def count(self, method, path, bytes_in):
+        endpoint = "%s %s" % (method, _endpoint_template(path))
+        with self.lock:
+            self.requests += 1
+            self.bytes_in += bytes_in
+            self.by_endpoint[endpoint] = self.by_endpoint.get(endpoint, 0) + 1
+
+    def stats(self):
+        with self.lock:
+            return dict(requests=self.requests, logins=self.logins, bytes_in=self.bytes_in, bytes_out=self.bytes_out,
+                        connections=self.connections, endpoints=dict(self.by_endpoint))
+
+    def template_definition(self, name):
+        source = self.templates[name]
+        parameters = []
+        for match in PARAM_PATTERN.finditer(source):
+            param = dict(name=match.group(1), type=match.group(2))
+            if 'direction=out' in match.group(3):
+                param['direction'] = 'out'
+            parameters.append(param)
+        for index in range(self.options.template_params):
+            parameters.append(dict(name="extra%d" % index, type='string', defaultValue='', prompt='padding'))
+        return dict(name=name, valid=True, info=dict(devices=[dict(name='adc', type='alteon')],
+                                                     parameters=parameters, userTypes=[]))
+
+    def start_runnable(self, server_address, scheme):
+        with self.lock:
+            runnable_id = str(len(self.runnables) + 1)
+            self.runnables[runnable_id] = time.time() + self.options.async_duration
+        return dict(complete=False, uri="%s://%s:%d/api/runnable/%s" % (scheme, server_address[0],
+                                                                        server_address[1], runnable_id))
+
+
+def _endpoint_template(path):
+    path = path.split('?')[0]
+    path = re.sub(r"^/api/(template|workflowTemplate|workflow|adc|defensePro|appWall|runnable)/[^/]+",
+                  r"/api/\1/<name>", path)
+    return re.sub(r"/action/[^/]+$", "/action/<action>", path)
+
+
+def _etag(content):
+    if not isinstance(content, bytes):
+        content = content.encode('utf-8')
+    return '"%s"' % hashlib.sha1(content).hexdigest()
+
+
+class MockHandler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    state = None
+
+    def log_message(self, *args):
+        pass
+
+    def setup(self):
+        BaseHTTPRequestHandler.setup(self)
+        with self.state.lock:
+            self.state.connections += 1
+
+    def _send(self, status, body=b'', content_type='application/json', headers=None):
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body)
+        if not isinstance(body, bytes):
+            body = body.encode('utf-8')
+        etag = (headers or {}).get('ETag')
+        if etag and self.headers.get('If-None-Match') == etag and status == 200:
+            status, body = 304, b''
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+        with self.state.lock:
+            self.state.bytes_out += len(body)
+
+    def _not_found(self, message="not found"):
+        self._send(404, dict(message=message))
+
+    def _authorized(self):
+        if self.headers.get('Authorization', '').startswith('Basic '):
+            with self.state.lock:
+                self.state.logins += 1
+            return True
+        cookie = self.headers.get('Cookie', '')
+        now = time.time()
+        timeout = self.state.options.session_timeout
+        with self.state.lock:
+            for session, last_use in list(self.state.sessions.items()):
+                if timeout and now - last_use > timeout:
+                    del self.state.sessions[session]
+                elif ('JSESSIONID=%s' % session) in cookie:
+                    self.state.sessions[session] = now
+                    return True
+        return False
+
+    def _handle(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        parsed = urlparse(self.path)
+        path, query = parsed.path, parse_qs(parsed.query)
+
+        if path.startswith('/_mock/'):
+            # control connections are not counted
+            with self.state.lock:
+                self.state.connections -= 1
+        if path == '/_mock/stats':
+            return self._send(200, self.state.stats())
+        if path == '/_mock/reset':
+            self.state.reset()
+            return self._send(204)
+
+        self.state.count(self.command, path, len(body))
+        if self.state.options.latency:
+            time.sleep(self.state.options.latency / 1000.0)
+
+        if path == '/api/ha/active':
+            return self._send(204 if self.state.options.role == 'active' else 404)
+        if path == '/api':
+            return self._send(200, dict(vDirectVersion=VDIRECT_VERSION))
+        if self.state.options.role != 'active':
+            return self._send(503, dict(message="standby vDirect"))
+        if not self._authorized():
+            return self._send(401, dict(message="authentication required"))
+
+        headers = {}
+        if 'Authorization' in self.headers:
+            session = hashlib.sha1(self.headers['Authorization'].encode('utf-8')).hexdigest()
+            with self.state.lock:
+                self.state.sessions[session] = time.time()
+            headers['Set-Cookie'] = 'JSESSIONID=%s; Path=/; HttpOnly' % session
+
+        for pattern, handler in ROUTES:
+            match = re.match(pattern, path)
+            if match and hasattr(self, "%s_%s" % (handler, self.command.lower())):
+                method = getattr(self, "%s_%s" % (handler, self.command.lower()))
+                return method(headers, body, query, *match.groups())
+        return self._not_found("no such endpoint")
+
+    do_GET = do_POST = do_PUT = do_DELETE = _handle
+
+    # configuration templates
+    def templates_get(self, headers, body, query):
+        return self._send(200, [dict(name=name, uri="api/template/%s" % name) for name in self.state.templates],
+                          headers=headers)
+
+    def templates_post(self, headers, body, query):
+        name = query.get('name', [''])[0]
+        if name in self.state.templates:
+            return self._send(409, dict(message="template exists"))
+        self.state.templates[name] = body.decode('utf-8')
+        return self._send(201, dict(name=name), headers=headers)
+
+    def template_get(self, headers, body, query, name):
+        if name not in self.state.templates:
+            return self._not_found()
+        headers['ETag'] = _etag(self.state.templates[name])
+        return self._send(200, self.state.template_definition(name), headers=headers)
+
+    def template_post(self, headers, body, query, name):
+        if name not in self.state.templates:
+            return self._not_found()
+        request = json.loads(body.decode('utf-8'))
+        if request.get('dryRun'):
+            return self._send(200, dict(cliOutput="dry run", generatedScript="/c/slb\n", parameters={}),
+                              headers=headers)
+        for connections in request.get('deviceConnections', {}).values():
+            for connection in connections:
+                device = connection['deviceId']['name']
+                self.state.pending[device] = self.state.pending.get(device, 0) + 1
+        return self._send(200, dict(parameters=dict(z=1)), headers=headers)
+
+    def template_source_get(self, headers, body, query, name):
+        if name not in self.state.templates:
+            return self._not_found()
+        return self._send(200, self.state.templates[name], 'text/x-velocity', headers=headers)
+
+    def template_source_put(self, headers, body, query, name):
+        if name not in self.state.templates:
+            return self._not_found()
+        self.state.templates[name] = body.decode('utf-8')
+        return self._send(200, dict(name=name), headers=headers)
+
+    # workflow templates and workflows
+    def workflow_templates_get(self, headers, body, query):
+        return self._send(200, [dict(name=name, uri="api/workflowTemplate/%s" % name)
+                                for name in self.state.workflow_templates], headers=headers)
+
+    def _read_archive(self, body):
+        try:
+            workflow_xml = zipfile.ZipFile(io.BytesIO(body)).read('workflow.xml').decode('utf-8')
+            return WORKFLOW_NAME_PATTERN.search(workflow_xml).group(1), ACTION_PATTERN.findall(workflow_xml)
+        except (zipfile.BadZipfile, KeyError, AttributeError):
+            return None, None
+
+    def workflow_templates_post(self, headers, body, query):
+        name, actions = self._read_archive(body)
+        if not name:
+            return self._send(400, dict(message="invalid workflow archive"))
+        if name in self.state.workflow_templates:
+            return self._send(409, dict(message="workflow template exists"))
+        self.state.workflow_templates[name] = dict(actions=actions, etag=_etag(body))
+        return self._send(201, dict(name=name), headers=headers)
+
+    def workflow_template_get(self, headers, body, query, name):
+        if name not in self.state.workflow_templates:
+            return self._not_found()
+        headers['ETag'] = self.state.workflow_templates[name]['etag']
+        return self._send(200, dict(name=name, valid=True), headers=headers)
+
+    def workflow_template_post(self, headers, body, query, name):
+        if name not in self.state.workflow_templates:
+            return self._not_found()
+        workflow_name = query.get('name', [''])[0]
+        if workflow_name in self.state.workflows:
+            return self._send(409, dict(message="workflow exists"))
+        self.state.workflows[workflow_name] = name
+        return self._send(202, self.state.start_runnable(self.server.server_address, self.server.scheme),
+                          headers=headers)
+
+    def workflow_template_archive_put(self, headers, body, query, name):
+        if name not in self.state.workflow_templates:
+            return self._not_found()
+        archive_name, actions = self._read_archive(body)
+        if archive_name != name:
+            return self._send(400, dict(message="invalid workflow archive"))
+        self.state.workflow_templates[name] = dict(actions=actions, etag=_etag(body))
+        return self._send(200, dict(name=name), headers=headers)
+
+    def workflow_create_definition_get(self, headers, body, query, name):
+        if name not in self.state.workflow_templates:
+            return self._not_found()
+        return self._send(200, dict(properties=[dict(name='x', type='int'), dict(name='y', type='int')]),
+                          headers=headers)
+
+    def workflow_delete(self, headers, body, query, name):
+        if self.state.workflows.pop(name, None) is None:
+            return self._not_found()
+        return self._send(202, self.state.start_runnable(self.server.server_address, self.server.scheme),
+                          headers=headers)
+
+    def workflow_action_get(self, headers, body, query, name, action):
+        if name not in self.state.workflows:
+            return self._not_found()
+        return self._send(200, dict(properties=[]), headers=headers)
+
+    def workflow_action_post(self, headers, body, query, name, action):
+        if name not in self.state.workflows:
+            return self._not_found()
+        return self._send(202, self.state.start_runnable(self.server.server_address, self.server.scheme),
+                          headers=headers)
+
+    def runnable_get(self, headers, body, query, runnable_id):
+        done_at = self.state.runnables.get(runnable_id)
+        if done_at is None:
+            return self._not_found()
+        resp = dict(uri="%s://%s:%d/api/runnable/%s" % (self.server.scheme, self.server.server_address[0],
+                                                        self.server.server_address[1], runnable_id),
+                    complete=time.time() >= done_at)
+        if resp['complete']:
+            resp.update(success=True, messages=["operation complete"], duration=self.state.options.async_duration)
+        return self._send(200, resp, headers=headers)
+
+    # devices
+    def diff_get(self, headers, body, query, device):
+        pending = self.state.pending.get(device, 0)
+        content = (("/c/slb/virt %d\n" % pending) * (self.state.options.diff_size // 16 + 1)
+                   )[:self.state.options.diff_size] if pending else self.state.options.clean_diff
+        headers['ETag'] = _etag("%s:%d" % (device, pending))
+        return self._send(200, content, 'text/plain', headers=headers)
+
+    def commit_post(self, headers, body, query, device):
+        if self.state.options.commit_duration:
+            time.sleep(self.state.options.commit_duration)
+        commit_needed = bool(self.state.pending.pop(device, 0))
+        return self._send(200, dict(commitNeeded=commit_needed), headers=headers)
+
+
+ROUTES = [
+    (r"^/api/template$", 'templates'),
+    (r"^/api/template/([^/]+)$", 'template'),
+    (r"^/api/template/([^/]+)/source$", 'template_source'),
+    (r"^/api/workflowTemplate$", 'workflow_templates'),
+    (r"^/api/workflowTemplate/([^/]+)$", 'workflow_template'),
+    (r"^/api/workflowTemplate/([^/]+)/archive$", 'workflow_template_archive'),
+    (r"^/api/workflowTemplate/([^/]+)/action/createWorkflow$", 'workflow_create_definition'),
+    (r"^/api/workflow/([^/]+)$", 'workflow'),
+    (r"^/api/workflow/([^/]+)/action/([^/]+)$", 'workflow_action'),
+    (r"^/api/runnable/([^/]+)$", 'runnable'),
+    (r"^/api/adc/([^/]+)/config$", 'diff'),
+    (r"^/api/(?:adc|defensePro|appWall)/([^/]+)/device$", 'commit'),
+]
+
+
+class MockServer(ThreadingMixIn, HTTPServer):
+
+    daemon_threads = True
+    allow_reuse_address = True
+    # batch operations open a connection per device at once
+    request_queue_size = 128
+    scheme = 'http'
+
+
+def start_server(options):
+    """
+    start the mock server in a background thread
+    :param options: parsed command line options, see parse_args
+    :return: MockServer
+    """
+    class Handler(MockHandler):
+        state = MockState(options)
+
+    server = MockServer((options.host, options.port), Handler)
+    server.state = Handler.state
+    if options.certfile:
+        context = ssl.SSLContext(ssl.PROTOCOL_SSLv23)
+        context.load_cert_chain(options.certfile, options.keyfile)
+        server.socket = context.wrap_socket(server.socket, server_side=True)
+        server.scheme = 'https'
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server
+
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser(description="local stand-in for the vDirect REST API")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=2189)
+    parser.add_argument('--role', choices=['active', 'standby'], default='active',
+                        help="standby answers api/ha/active with 404 and everything else with 503")
+    parser.add_argument('--latency', type=int, default=0, help="delay added to every request, in milliseconds")
+    parser.add_argument('--diff-size', type=int, default=4096,
+                        help="size of the pending changes diff of a device with pending changes, in bytes")
+    parser.add_argument('--clean-diff', default="\n",
+                        help="diff of a device without pending changes, whitespace only")
+    parser.add_argument('--template-params', type=int, default=0,
+                        help="optional parameters added to every configuration template definition")
+    parser.add_argument('--async-duration', type=float, default=1.0,
+                        help="seconds until an async workflow operation completes")
+    parser.add_argument('--commit-duration', type=float, default=0,
+                        help="seconds a device commit takes, as with an HA sync")
+    parser.add_argument('--session-timeout', type=float, default=0,
+                        help="seconds after which an unused session cookie is rejected, 0 never expires sessions")
+    parser.add_argument('--certfile', help="serve https with this certificate")
+    parser.add_argument('--keyfile', help="private key of --certfile")
+    return parser.parse_args(args)
+
+
+def main():
+    options = parse_args()
+    server = start_server(options)
+    print("mock vDirect listening on %s://%s:%d" % (server.scheme, options.host, server.server_address[1]))
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,364 @@
+#!/usr/bin/env python
+# (c) 2016, Radware LTD.
+
+# This file is part of Ansible
+#
+# Ansible is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Ansible is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+End to end benchmarks of the vdirect modules against the local mock vDirect (mock_vdirect.py).
+
+Every scenario runs ansible-playbook with the modules in library/ and reports, per run:
+    requests    round trips to vDirect
+    logins      requests vDirect had to verify credentials for (basic auth rather than a session cookie)
+    kb_in       request bytes sent to vDirect
+    kb_out      response bytes received from vDirect
+    wall        ansible-playbook wall time, in seconds (median of the repeats)
+    module      module process wall time, in seconds (median of the repeats)
+    rss_mb      peak resident memory of the module process
+
+The shared code must be importable by ansible, either installed with setup.yml or through
+ANSIBLE_MODULE_UTILS (set by this script) on ansible versions that support it.
+
+    python benchmarks/run_benchmarks.py --latency 20 --repeat 5 --json results.json
+    python benchmarks/run_benchmarks.py --latency 20 --baseline results.json
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+
+try:
+    from urllib2 import urlopen, Request
+except ImportError:
+    from urllib.request import urlopen, Request
+
+import mock_vdirect
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLES_DIR = os.path.join(REPO_DIR, 'samples', 'files')
+
+TEMPLATE_NAME = 'template_example.vm'
+WORKFLOW_TEMPLATE_NAME = 'workflow_example'
+
+# ansible_python_interpreter of the benchmark plays, recording wall time and peak memory of the module process.
+# ansible versions that ship modules in a wrapper run the module with the same interpreter again,
+# so every record names the measured process wrapping it
+MEASURE_SCRIPT = """#!%(python)s
+import json, os, sys, time
+start = time.time()
+wrapper = os.environ.get('VDIRECT_BENCH_WRAPPER')
+os.environ['VDIRECT_BENCH_WRAPPER'] = str(os.getpid())
+pid = os.spawnv(os.P_NOWAIT, %(python)r, [%(python)r] + sys.argv[1:])
+_, status, usage = os.wait4(pid, 0)
+with open(%(stats)r, 'a') as stats:
+    stats.write(json.dumps(dict(pid=os.getpid(), wrapper=wrapper, seconds=time.time() - start,
+                                maxrss=usage.ru_maxrss)) + '\\n')
+sys.exit(os.WEXITSTATUS(status))
+"""
+
+
+def _task(module, **args):
+    args.update(vdirect_ip='{{ vdirect_ip }}', port='{{ vdirect_port }}', scheme='{{ vdirect_scheme }}',
+                username='admin', password='radware', validate_certs=False, cache_dir='{{ cache_dir }}')
+    return {module: args}
+
+
+def _devices(count):
+    return [dict(name="adc%d" % index, parameters=dict(y=index % 10 + 1)) for index in range(count)]
+
+
+def _scenarios(options):
+    """
+    benchmark scenarios: name, setup tasks (not measured), measured tasks and whether to run in check mode
+    """
+    upload_template = _task('vdirect_file', template_name=TEMPLATE_NAME,
+                            template_file=os.path.join(SAMPLES_DIR, TEMPLATE_NAME), overwrite=True)
+    upload_workflow = _task('vdirect_file', workflow_archive='{{ workflow_archive }}', overwrite=True)
+    upload_workflow_dir = _task('vdirect_file', workflow_dir=os.path.join(SAMPLES_DIR, WORKFLOW_TEMPLATE_NAME),
+                                overwrite=True)
+    sync_files = _task('vdirect_file', template_files=[os.path.join(SAMPLES_DIR, '*.vm')],
+                       workflows=[os.path.join(SAMPLES_DIR, WORKFLOW_TEMPLATE_NAME)], overwrite=True)
+    create_workflow = _task('vdirect_workflow', operation='create', workflow_template_name=WORKFLOW_TEMPLATE_NAME,
+                            workflow_name='wf0', x=1, y=2)
+    operations = [dict(operation='create', workflow_template_name=WORKFLOW_TEMPLATE_NAME,
+                       workflow_name="wf%d" % index, parameters=dict(x=1, y=2))
+                  for index in range(1, options.operations + 1)]
+
+    return [
+        dict(name='file_template_upload',
+             tasks=[upload_template]),
+        dict(name='file_template_unchanged',
+             setup=[upload_template],
+             tasks=[upload_template]),
+        dict(name='file_workflow_upload',
+             tasks=[upload_workflow]),
+        dict(name='file_workflow_unchanged',
+             setup=[upload_workflow_dir],
+             tasks=[upload_workflow_dir]),
+        dict(name='file_sync_unchanged',
+             setup=[sync_files],
+             tasks=[sync_files]),
+        dict(name='template_execute',
+             setup=[upload_template],
+             tasks=[_task('vdirect_template', template_name=TEMPLATE_NAME, device_name='adc0', x=2, y=5)]),
+        dict(name='template_check_mode',
+             setup=[upload_template],
+             tasks=[_task('vdirect_template', template_name=TEMPLATE_NAME, device_name='adc0', x=2, y=5)],
+             check=True),
+        dict(name='template_batch',
+             setup=[upload_template],
+             tasks=[_task('vdirect_template', template_name=TEMPLATE_NAME, x=2,
+                          devices=_devices(options.devices))]),
+        dict(name='workflow_create_delete',
+             setup=[upload_workflow],
+             tasks=[create_workflow,
+                    _task('vdirect_workflow', operation='action', workflow_name='wf0', action='incrementZ'),
+                    _task('vdirect_workflow', operation='delete', workflow_name='wf0')]),
+        dict(name='workflow_operations',
+             setup=[upload_workflow],
+             tasks=[_task('vdirect_workflow', operations=operations),
+                    _task('vdirect_workflow', operations=[dict(operation='delete', workflow_name=op['workflow_name'])
+                                                          for op in operations])]),
+        dict(name='commit',
+             setup=[upload_template,
+                    _task('vdirect_template', template_name=TEMPLATE_NAME, device_name='adc0', x=2, y=5)],
+             tasks=[_task('vdirect_commit', device_name='adc0')]),
+        dict(name='commit_clean',
+             tasks=[_task('vdirect_commit', device_name='adc0', skip_if_clean=True)]),
+        dict(name='commit_batch',
+             setup=[upload_template,
+                    _task('vdirect_template', template_name=TEMPLATE_NAME, x=2, devices=_devices(options.devices))],
+             tasks=[_task('vdirect_commit', devices=[device['name'] for device in _devices(options.devices)])]),
+    ]
+
+
+class Benchmark(object):
+
+    def __init__(self, options, work_dir):
+        self.options = options
+        self.work_dir = work_dir
+        self.stats_file = os.path.join(work_dir, 'module_stats.jsonl')
+        self.interpreter = os.path.join(work_dir, 'measure_python')
+        with open(self.interpreter, 'w') as script:
+            script.write(MEASURE_SCRIPT % dict(python=options.python, stats=self.stats_file))
+        os.chmod(self.interpreter, 0o755)
+
+        self.workflow_archive = os.path.join(work_dir, 'workflow_example.zip')
+        with zipfile.ZipFile(self.workflow_archive, 'w') as archive:
+            archive.write(os.path.join(SAMPLES_DIR, WORKFLOW_TEMPLATE_NAME, 'workflow.xml'), 'workflow.xml')
+
+        self.server = mock_vdirect.start_server(mock_vdirect.parse_args([
+            '--port', '0',
+            '--latency', str(options.latency),
+            '--diff-size', str(options.diff_size),
+            '--template-params', str(options.template_params),
+            '--async-duration', str(options.async_duration),
+            '--commit-duration', str(options.commit_duration)]))
+        self.base_url = "http://127.0.0.1:%d" % self.server.server_address[1]
+
+    def _mock(self, path, method='GET'):
+        resp = urlopen(Request(self.base_url + path, data=b'' if method == 'POST' else None))
+        body = resp.read()
+        return json.loads(body.decode('utf-8')) if body else None
+
+    def _playbook(self, name, tasks, cache_dir):
+        play = dict(name=name, hosts='localhost', connection='local', gather_facts=False, tasks=tasks,
+                    vars=dict(vdirect_ip='127.0.0.1', vdirect_port=self.server.server_address[1],
+                              vdirect_scheme='http', cache_dir=cache_dir,
+                              workflow_archive=self.workflow_archive, ansible_python_interpreter=self.interpreter))
+        path = os.path.join(self.work_dir, "%s.json" % name)
+        with open(path, 'w') as playbook:
+            json.dump([play], playbook, indent=2)
+        return path
+
+    def _ansible_playbook(self, playbook, check):
+        command = [self.options.ansible_playbook, '-i', 'localhost,', '-M', os.path.join(REPO_DIR, 'library'),
+                   playbook]
+        if check:
+            command.append('--check')
+        env = dict(os.environ, ANSIBLE_MODULE_UTILS=os.path.join(REPO_DIR, 'module_utils'),
+                   ANSIBLE_RETRY_FILES_ENABLED='false', PYTHONDONTWRITEBYTECODE='1')
+        start = time.time()
+        proc = subprocess.Popen(command, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        output = proc.communicate()[0]
+        if proc.returncode:
+            sys.stderr.write(output.decode('utf-8', 'replace'))
+            raise RuntimeError("%s failed with exit code %d" % (' '.join(command), proc.returncode))
+        return time.time() - start
+
+    def _module_stats(self):
+        if not os.path.exists(self.stats_file):
+            return []
+        with open(self.stats_file) as stats:
+            runs = [json.loads(line) for line in stats if line.strip()]
+        os.remove(self.stats_file)
+        # keep the module processes, not the module wrappers
+        wrappers = set(run['wrapper'] for run in runs)
+        return [run for run in runs if str(run['pid']) not in wrappers]
+
+    def run(self, scenario):
+        """
+        run a scenario options.repeat times
+        :param scenario: scenario dict, see _scenarios
+        :return: result dict
+        """
+        runs = []
+        for repeat in range(self.options.repeat):
+            self.server.state.clear()
+            cache_dir = os.path.join(self.work_dir, 'cache', scenario['name'])
+            if self.options.cold or repeat == 0:
+                shutil.rmtree(cache_dir, ignore_errors=True)
+
+            if scenario.get('setup'):
+                self._ansible_playbook(self._playbook(scenario['name'] + '_setup', scenario['setup'], cache_dir),
+                                       False)
+            self._module_stats()
+            self._mock('/_mock/reset', 'POST')
+
+            wall = self._ansible_playbook(self._playbook(scenario['name'], scenario['tasks'], cache_dir),
+                                          scenario.get('check', False))
+            modules = self._module_stats()
+            stats = self._mock('/_mock/stats')
+            runs.append(dict(wall=wall,
+                             module=sum(module['seconds'] for module in modules),
+                             rss_kb=max([module['maxrss'] for module in modules] or [0]),
+                             requests=stats['requests'],
+                             logins=stats['logins'],
+                             connections=stats['connections'],
+                             bytes_in=stats['bytes_in'],
+                             bytes_out=stats['bytes_out'],
+                             endpoints=stats['endpoints']))
+
+        # the first run of a warm benchmark fills the cache, report the steady state
+        measured = runs if self.options.cold or len(runs) == 1 else runs[1:]
+        return dict(name=scenario['name'],
+                    wall=_median([run['wall'] for run in measured]),
+                    module=_median([run['module'] for run in measured]),
+                    rss_kb=max(run['rss_kb'] for run in measured),
+                    requests=max(run['requests'] for run in measured),
+                    logins=max(run['logins'] for run in measured),
+                    connections=max(run['connections'] for run in measured),
+                    bytes_in=max(run['bytes_in'] for run in measured),
+                    bytes_out=max(run['bytes_out'] for run in measured),
+                    endpoints=measured[-1]['endpoints'])
+
+    def close(self):
+        self.server.shutdown()
+
+
+def _median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    return values[middle] if len(values) % 2 else (values[middle - 1] + values[middle]) / 2.0
+
+
+def _report(results, verbose):
+    columns = "%-26s %8s %7s %7s %9s %9s %8s %8s %8s"
+    print(columns % ('scenario', 'requests', 'logins', 'conns', 'kb_in', 'kb_out', 'wall', 'module', 'rss_mb'))
+    for result in results:
+        print(columns % (result['name'], result['requests'], result['logins'], result['connections'],
+                         "%.1f" % (result['bytes_in'] / 1024.0), "%.1f" % (result['bytes_out'] / 1024.0),
+                         "%.2f" % result['wall'], "%.2f" % result['module'], "%.1f" % (result['rss_kb'] / 1024.0)))
+        if verbose:
+            for endpoint, count in sorted(result['endpoints'].items()):
+                print("    %-60s %d" % (endpoint, count))
+
+
+def _compare(results, baseline_file, tolerance):
+    """
+    compare results with a previous --json run
+    :return: list of regression descriptions
+    """
+    with open(baseline_file) as baseline:
+        baseline = dict((result['name'], result) for result in json.load(baseline)['results'])
+
+    regressions = []
+    for result in results:
+        previous = baseline.get(result['name'])
+        if not previous:
+            continue
+        if result['requests'] > previous['requests']:
+            regressions.append("%s: %d requests, was %d" % (result['name'], result['requests'], previous['requests']))
+        if 'logins' in previous and result['logins'] > previous['logins']:
+            regressions.append("%s: %d logins, was %d" % (result['name'], result['logins'], previous['logins']))
+        for metric in ('module', 'rss_kb'):
+            if previous[metric] and result[metric] > previous[metric] * (1 + tolerance):
+                regressions.append("%s: %s %.2f, was %.2f" % (result['name'], metric, result[metric],
+                                                              previous[metric]))
+    return regressions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="end to end benchmarks of the vdirect modules")
+    parser.add_argument('scenarios', nargs='*', help="scenarios to run, all by default")
+    parser.add_argument('--repeat', type=int, default=3, help="runs per scenario")
+    parser.add_argument('--cold', action='store_true', help="clear the module cache before every run")
+    parser.add_argument('--latency', type=int, default=0, help="mock vDirect latency per request, in milliseconds")
+    parser.add_argument('--diff-size', type=int, default=64 * 1024, help="size of a pending changes diff, in bytes")
+    parser.add_argument('--template-params', type=int, default=0,
+                        help="optional parameters added to the configuration template definition")
+    parser.add_argument('--async-duration', type=float, default=1.0,
+                        help="seconds until an async workflow operation completes")
+    parser.add_argument('--commit-duration', type=float, default=0,
+                        help="seconds a device commit takes, as with an HA sync")
+    parser.add_argument('--devices', type=int, default=10,
+                        help="devices in the template_batch and commit_batch scenarios")
+    parser.add_argument('--operations', type=int, default=10, help="workflows in the workflow_operations scenario")
+    parser.add_argument('--python', default=sys.executable, help="python interpreter running the modules")
+    parser.add_argument('--ansible-playbook', default='ansible-playbook', help="ansible-playbook executable")
+    parser.add_argument('--json', help="write the results to this file")
+    parser.add_argument('--baseline', help="compare with the results of a previous --json run")
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help="allowed increase of module time and memory over the baseline, as a fraction")
+    parser.add_argument('--verbose', '-v', action='store_true', help="report requests per endpoint")
+    return parser.parse_args()
+
+
+def main():
+    options = parse_args()
+    work_dir = tempfile.mkdtemp(prefix='vdirect_bench_')
+    benchmark = Benchmark(options, work_dir)
+    try:
+        scenarios = [scenario for scenario in _scenarios(options)
+                     if not options.scenarios or scenario['name'] in options.scenarios]
+        results = [benchmark.run(scenario) for scenario in scenarios]
+    finally:
+        benchmark.close()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    _report(results, options.verbose)
+    if options.json:
+        with open(options.json, 'w') as output:
+            json.dump(dict(options=dict(latency=options.latency, diff_size=options.diff_size,
+                                        template_params=options.template_params, repeat=options.repeat,
+                                        cold=options.cold),
+                           results=results), output, indent=2, sort_keys=True)
+
+    if options.baseline:
+        regressions = _compare(results, options.baseline, options.tolerance)
+        for regression in regressions:
+            print("REGRESSION %s" % regression)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
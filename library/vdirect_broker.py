@@ -0,0 +1,147 @@
+#!/usr/bin/python
+# (c) 2016, Radware LTD.
+
+# This file is part of Ansible
+#
+# Ansible is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Ansible is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+
+DOCUMENTATION = """
+---
+module: vdirect_broker
+short_description: Start or stop the vDirect connection broker of the controller
+description:
+    - This module starts or stops a broker daemon that keeps connections to vDirect open between module runs.
+    - The vDirect modules send their requests through the broker listening on I(broker_socket) when it is running,
+      so TCP and TLS connections to vDirect are set up once per play instead of once per task.
+    - Run it on the controller (delegate_to localhost, or a local connection), once per play.
+version_added: "2.1"
+options:
+  state:
+    description:
+      - started - Start the broker, unless it is already running.
+      - stopped - Stop the broker.
+    required: False
+    default: started
+    choices: ['started', 'stopped']
+    version_added: "2.1"
+  broker_socket:
+    description:
+      - Path of the unix socket the broker listens on. Must match I(broker_socket) of the other vDirect modules.
+    required: False
+    default: ~/.ansible/vdirect_broker.sock
+    version_added: "2.1"
+  idle_timeout:
+    description:
+      - Seconds without requests after which the broker stops by itself.
+    required: False
+    default: 600
+    version_added: "2.1"
+notes:
+   - Modules fall back to their own connections when the broker is not running or can not be reached.
+   - The socket is only accessible to the user that started the broker.
+"""
+
+EXAMPLES = """
+- vdirect_broker:
+  delegate_to: localhost
+  run_once: true
+
+- vdirect_template:
+    vdirect_ip: 127.0.0.1
+    username: user
+    password: password
+    template_name: set_vlan.vm
+    device_name: alteon1
+    vlan: 10
+
+- vdirect_broker:
+    state: stopped
+  delegate_to: localhost
+  run_once: true
+"""
+
+RETURN = """
+broker:
+    description: Broker status - pid, uptime, requests, active, idle_timeout, opened, reused, tls_resumed
+                 (connections opened, reused, and opened with a resumed tls session). Empty when it is not running.
+    returned: always
+    type: dict
+    sample: "{ 'broker': {'pid': 1234, 'uptime': 35.2, 'requests': 48, 'opened': 2, 'reused': 46}}"
+"""
+
+
+def _augment_arg_spec(arg_spec):
+    """
+    add module arguments
+    :param arg_spec:
+    :return:
+    """
+    arg_spec.update(
+        dict(
+            state=dict(type='str', required=False, default='started', choices=['started', 'stopped']),
+            broker_socket=dict(type='str', required=False, default='~/.ansible/vdirect_broker.sock'),
+            idle_timeout=dict(type='int', required=False, default=600)
+        )
+    )
+    return arg_spec
+
+
+def _create_ansible_module(arg_spec, check_invalid_args=True):
+    """
+    create AnsibleModule instance
+    :param arg_spec:
+    :param check_invalid_args:
+    :return:
+    """
+    module = AnsibleModule(
+        arg_spec,
+        supports_check_mode=True,
+        check_invalid_arguments=check_invalid_args,
+    )
+    return module
+
+
+def main():
+    # the broker does not talk to vDirect itself, so the base vdirect_api arguments are not needed
+    module = _create_ansible_module(_augment_arg_spec(dict()))
+
+    if not HAS_KEEPALIVE:
+        module.fail_json(msg="the broker requires python 2.7.9 or later")
+
+    state = module.params['state']
+    broker_socket = module.params['broker_socket']
+    status = broker_command(broker_socket, 'status')
+
+    if state == 'started':
+        if status is not None:
+            module.exit_json(changed=False, broker=status)
+        if module.check_mode:
+            module.exit_json(changed=True, broker={})
+        status = start_broker(broker_socket, module.params['idle_timeout'])
+        if status is None:
+            module.fail_json(msg="broker did not start listening on %s" % broker_socket)
+        module.exit_json(changed=True, broker=status)
+
+    if status is None:
+        module.exit_json(changed=False, broker={})
+    if not module.check_mode:
+        status = broker_command(broker_socket, 'stop')
+    module.exit_json(changed=True, broker=status or {})
+
+# standard ansible module imports
+from ansible.module_utils.basic import *
+from ansible.module_utils.vdirect_api import *
+
+if __name__ == '__main__':
+    main()
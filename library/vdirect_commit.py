@@ -24,12 +24,37 @@ description:
     - This module uses the vDirect REST API to run the 'Commit' action on a managed device.
 version_added: "2.1"
 extends_documentation_fragment: vdirect_api
+options:
+  devices:
+    description:
+      - Commit several devices in one module call, instead of I(device_name).
+      - Each item is a device name, or a dictionary with the device I(name) and its I(device_type)
+        when it differs from the I(device_type) given to the module.
+      - Up to I(concurrency) devices are committed at the same time.
+    required: False
+    default: None
+    version_added: "2.1"
+  concurrency:
+    description:
+      - Maximum number of devices committed at the same time when I(devices) is used.
+    required: False
+    default: 10
+    version_added: "2.1"
+  skip_if_clean:
+    description:
+      - Check the pending changes of the device first, and skip the commit when there are none.
+      - Supported by Alteon devices. Other device types are always committed.
+    required: False
+    default: False
+    version_added: "2.1"
 notes:
     - vDirect executes a Commit action on the device only if there are changes to commit.
     - When changed == True, changes were committed. When 'changed' == False there were no changes to commit.
     - If executing commit results in a sync operation (for example, between an HA pair of Alteon devices)
       this action may take a long time to finish even if there are no pending changes.
-    - Check mode is supported. Check mode connects to vDirect and verifies that the vDirect version is supported, but does not commit changes or report anything.
+      Use I(skip_if_clean) to avoid it.
+    - Check mode is supported. In check mode, changed tells whether an Alteon device has pending changes that
+      would be committed. For other device types check mode does not report anything.
 """
 
 EXAMPLES = """
@@ -39,6 +64,25 @@ EXAMPLES = """
     username: user
     password: password
     device_name: alteon1
+
+# commit an HA pair of Alteons and a DefensePro at the same time
+- vdirect_commit:
+    vdirect_ip: 127.0.0.1
+    username: user
+    password: password
+    devices:
+      - alteon1
+      - alteon2
+      - name: dp1
+        device_type: defensePro
+
+# commit only when there are pending changes, sparing the HA sync otherwise
+- vdirect_commit:
+    vdirect_ip: 127.0.0.1
+    username: user
+    password: password
+    device_name: alteon1
+    skip_if_clean: true
 """
 
 RETURN = """
@@ -47,9 +91,33 @@ changed:
     returned: always
     type: boolean
     sample: "{ 'changed': true }"
+devices:
+    description: Result per device when I(devices) is used - commitNeeded, changed, failed, duration and msg.
+                 In check mode commitNeeded is null for device types that can not tell.
+    returned: when devices is used
+    type: json object
+    sample: "{ 'devices': {'alteon1': {'commitNeeded': true, 'changed': true, 'failed': false, 'duration': 8.1}}}"
 """
 
 
+def _augment_arg_spec(arg_spec):
+    """
+    add module arguments
+    :param arg_spec:
+    :return:
+    """
+    arg_spec.update(
+        dict(
+            devices=dict(type='list', required=False),
+            concurrency=dict(type='int', required=False, default=10),
+            skip_if_clean=dict(type='bool', required=False, default='false'),
+            # device_name is not needed when committing a list of devices
+            device_name=dict(type='str', required=False, aliases=['device'])
+        )
+    )
+    return arg_spec
+
+
 def _create_ansible_module(arg_spec, check_invalid_args=True):
     """
     create AnsibleModule instance
@@ -61,22 +129,80 @@ def _create_ansible_module(arg_spec, check_invalid_args=True):
         arg_spec,
         supports_check_mode=True,
         check_invalid_arguments=check_invalid_args,
+        mutually_exclusive=(
+            ['device_name', 'devices'],
+        ),
     )
     return module
 
 
+def _parse_devices(module, devices, device_type):
+    """
+    build the (device_name, device_type) list for batch commit
+    :param module:
+    :param devices:
+    :param device_type: device type of items without one
+    :return:
+    """
+    parsed = []
+    for device in devices:
+        if isinstance(device, dict):
+            if 'name' not in device:
+                module.fail_json(msg="devices items must have a name", device=device)
+            parsed.append((device['name'], device.get('device_type') or device_type))
+        else:
+            parsed.append((device, device_type))
+    return parsed
+
+
+def _commit_batch(module, vdirect, devices, concurrency, skip_if_clean):
+    """
+    commit all devices and exit the module with the per device results
+    """
+    results = vdirect.commit_batch(devices, concurrency, skip_if_clean, module.check_mode)
+
+    device_results = {}
+    for device_name, result in results.items():
+        if isinstance(result, vDirectError):
+            device_results[device_name] = dict(result.result, changed=False, failed=True)
+        else:
+            commit_needed, duration = result
+            device_results[device_name] = dict(commitNeeded=commit_needed, changed=bool(commit_needed),
+                                               failed=False, duration=duration)
+
+    changed = any(result['changed'] for result in device_results.values())
+    failed = [name for name, result in device_results.items() if result['failed']]
+    if failed:
+        module.fail_json(msg="commit failed on %d of %d devices" % (len(failed), len(devices)),
+                         failed_devices=failed, changed=changed, devices=device_results)
+
+    module.exit_json(changed=changed, devices=device_results)
+
+
 def main():
 
-    argument_spec = vdirect_argument_spec()
+    argument_spec = _augment_arg_spec(vdirect_argument_spec())
     module = _create_ansible_module(argument_spec)
 
     vdirect = vDirect(module)
-    show_help = vdirect.get_arg_subset('help')
+    show_help, device_name, device_type, devices, concurrency, skip_if_clean = \
+        vdirect.get_arg_subset('help',
+                               'device_name',
+                               'device_type',
+                               'devices',
+                               'concurrency',
+                               'skip_if_clean')
 
     if show_help:
         module.exit_json(changed=False, usage="executes commit on the managed device")
 
-    module.exit_json(changed=False if module.check_mode else vdirect.commit())
+    if not device_name and not devices:
+        module.fail_json(msg="one of the following is required: device_name, devices")
+
+    if devices:
+        _commit_batch(module, vdirect, _parse_devices(module, devices, device_type), concurrency, skip_if_clean)
+
+    module.exit_json(changed=bool(vdirect.commit(skip_if_clean, module.check_mode)))
 
 # standard ansible module imports
 from ansible.module_utils.basic import *
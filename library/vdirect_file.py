@@ -55,6 +55,39 @@ options:
     default: None
     aliases: [ 'archive', 'zip' ]
     version_added: "2.1"
+  workflow_dir:
+    description:
+      - Directory on disk holding the workflow files, with workflow.xml at its top. The module zips it into the
+        workflow archive to upload.
+      - The archive is built the same way on every run - entries sorted by path, with fixed timestamps and
+        permissions - and files and directories whose names start with '.' are left out.
+    required: False
+    default: None
+    version_added: "2.1"
+  template_files:
+    description:
+      - Synchronize many configuration templates in one module call, instead of I(template_name) and
+        I(template_file).
+      - A list of files or glob patterns, such as C(templates/*.vm). Each file is uploaded as the template named
+        after the file's base name, unless vDirect already holds the same source.
+    required: False
+    default: None
+    version_added: "2.1"
+  workflows:
+    description:
+      - Synchronize many workflow templates in one module call, instead of I(workflow_archive) or I(workflow_dir).
+      - A list of paths or glob patterns of workflow source directories (see I(workflow_dir)) and workflow
+        archives.
+    required: False
+    default: None
+    version_added: "2.1"
+  concurrency:
+    description:
+      - Maximum number of templates and workflows synchronized at the same time when I(template_files) or
+        I(workflows) is used.
+    required: False
+    default: 10
+    version_added: "2.1"
   device_name:
     description:
       - As template/workflows are uploaded to vDirect, a device_name is not required. However this argument
@@ -64,9 +97,22 @@ options:
     default: adc
     version_added: "2.1"
 notes:
-   - The module specification allows providing either template_name + template_file or workflow_archive, not both.
+   - The module specification allows providing either template_name + template_file, workflow_archive or
+     workflow_dir, only one of them. template_files and workflows can be used together, instead of the others.
+   - With template_files and workflows, the names of the templates and workflow templates on vDirect are listed
+     with one request each. Files that vDirect does not hold yet are uploaded without further checks.
+   - The sha256 digest of every uploaded file is kept in I(cache_dir). When the digest of the local file matches
+     the digest recorded for the template, and vDirect reports the same revision (ETag or Last-Modified) as when it
+     was recorded, nothing is downloaded or uploaded. When vDirect reports no revision, the recorded digest is
+     trusted for I(cache_ttl) seconds.
+   - The digest of a workflow archive covers the names and content of its files, not their timestamps, so an archive
+     zipped again from unchanged files is not uploaded again.
+   - Without a recorded digest, a template source is downloaded and compared with the file, and a workflow archive
+     is uploaded.
+   - workflow.xml is checked before the archive is uploaded - its createAction and deleteAction must be
+     actions of the workflow.
    - Check mode is supported. Check mode tests everything it can without actually uploading the file/archive to vDirect,
-     meaning it can't validate the file's syntax.
+     meaning it can't validate the file's syntax. changed reports whether the file would be uploaded.
 """
 
 EXAMPLES = """
@@ -90,6 +136,27 @@ EXAMPLES = """
     template_name: tmpl4.vm
     template_file: "/tmp/tmpl.vm"
     overwrite: true
+
+# build the workflow archive from its source directory, and upload it when its files changed
+# (added base vdirect_api mandatory params)
+- vdirect_file:
+    vdirect_ip: 127.0.0.1
+    username: user
+    password: password
+    workflow_dir: "/tmp/workflows/wf1"
+    overwrite: true
+
+# synchronize all templates and workflows of a source tree, uploading only what changed
+# (added base vdirect_api mandatory params)
+- vdirect_file:
+    vdirect_ip: 127.0.0.1
+    username: user
+    password: password
+    template_files:
+      - "/src/vdirect/templates/*.vm"
+    workflows:
+      - "/src/vdirect/workflows/*"
+    overwrite: true
 """
 
 RETURN = """
@@ -98,6 +165,29 @@ changed:
     returned: always
     type: boolean
     sample: "{ 'changed': true }"
+upload:
+    description: Size, duration and throughput (bytes per second) of the upload. Files are streamed from disk.
+    returned: when a file was uploaded
+    type: json object
+    sample: "{ 'upload': {'bytes': 1048576, 'seconds': 0.5, 'throughput': 2097152}}"
+workflow:
+    description: Metadata of the workflow archive, as declared by its workflow.xml - name, createAction,
+                 deleteAction, persisted parameters (name and type) and actions (name, visible and input parameters).
+    returned: when workflow_archive or workflow_dir is used
+    type: json object
+    sample: "{ 'workflow': {'name': 'wf1', 'createAction': 'init', 'deleteAction': 'delete', 'parameters': [...],
+              'actions': [{'name': 'init', 'visible': false, 'inputs': ['x', 'y']}]}}"
+files:
+    description: Result per local file or workflow directory when template_files or workflows is used - name of the
+                 template or workflow template, status (added, updated, unchanged or failed) and msg.
+    returned: when template_files or workflows is used
+    type: json object
+    sample: "{ 'files': {'/src/templates/vlan.vm': {'name': 'vlan.vm', 'status': 'unchanged'}}}"
+summary:
+    description: Number of templates and workflow templates added, updated, unchanged and failed.
+    returned: when template_files or workflows is used
+    type: json object
+    sample: "{ 'summary': {'added': 1, 'updated': 2, 'unchanged': 297, 'failed': 0}}"
 """
 
 
@@ -113,6 +203,10 @@ def _augment_arg_spec(arg_spec):
             template_file=dict(type='str', required=False, aliases=['file']),
             overwrite=dict(type='bool', required=False, defaultValue='no'),
             workflow_archive=dict(type='str', required=False, aliases=['archive', 'zip']),
+            workflow_dir=dict(type='str', required=False),
+            template_files=dict(type='list', required=False),
+            workflows=dict(type='list', required=False),
+            concurrency=dict(type='int', required=False, default=10),
             # overwriting device name. not needed for this module.
             device_name=dict(type='str', required=False, defaultValue='adc')
         )
@@ -135,80 +229,248 @@ def _create_ansible_module(arg_spec, check_invalid_args=True):
             ['template_name', 'template_file'],
         ),
         mutually_exclusive=(
-            ['template_name', 'workflow_archive'],
-            ['template_file', 'workflow_archive']
+            ['template_name', 'workflow_archive', 'workflow_dir', 'template_files'],
+            ['template_file', 'workflow_archive', 'workflow_dir', 'template_files'],
+            ['template_name', 'workflow_archive', 'workflow_dir', 'workflows'],
         ),
         required_one_of=(
-            ['template_name', 'workflow_archive'],
+            ['template_name', 'workflow_archive', 'workflow_dir', 'template_files', 'workflows'],
         ),
     )
     return module
 
 
-def main():
-    argument_spec = _augment_arg_spec(vdirect_argument_spec())
+def _sync_template(vdirect, template_name, template_file, overwrite, check_mode, listed=None):
+    """
+    upload a configuration template source unless vDirect already holds the same source
+    :param vdirect:
+    :param template_name:
+    :param template_file:
+    :param overwrite:
+    :param check_mode:
+    :param listed: names of the templates on vDirect, when already known
+    :return: changed
+    """
+    if listed is not None and template_name not in listed:
+        template_exists, revision = False, None
+    else:
+        template_exists, revision = vdirect.find_template(template_name, with_revision=True)
+    if template_exists and not overwrite:
+        vdirect.module.fail_json(msg="Failure creating template. template named %s already exists" % template_name)
 
-    module = _create_ansible_module(argument_spec)
-    vdirect = vDirect(module)
+    local_digest = vdirect.file_digest(template_file)
+    if template_exists:
+        if vdirect.uploaded_digest('template', template_name, revision) == local_digest:
+            return False
+        if vdirect.download_template_digest(template_name) == local_digest:
+            vdirect.record_upload('template', template_name, local_digest, revision)
+            return False
 
-    template_name, template_file, overwrite, workflow_archive, show_help = vdirect.get_arg_subset('template_name',
-                                                                                                  'template_file',
-                                                                                                  'overwrite',
-                                                                                                  'workflow_archive',
-                                                                                                  'help'
-                                                                                                  )
-    if show_help:
-        module.exit_json(changed=False, usage="Uploads provided file/archive to vDirect")
+    if check_mode:
+        return True
 
-    check_mode = module.check_mode
+    with vdirect.open_file(template_file) as file_data:
+        if template_exists:
+            changed = vdirect.update_template(template_name, file_data)
+        else:
+            changed = vdirect.upload_template(template_name, file_data)
+    # the revision of the uploaded source, so a later upload by someone else is not taken for this one
+    vdirect.record_upload('template', template_name, local_digest,
+                          vdirect.find_template(template_name, with_revision=True)[1])
+    return changed
+
+
+def _validate_workflow(vdirect, workflow):
+    """
+    fail before uploading an archive whose create or delete action is not one of its actions
+    :param vdirect:
+    :param workflow: metadata of workflow.xml
+    """
+    actions = [action['name'] for action in workflow['actions']]
+    for attribute in ('createAction', 'deleteAction'):
+        if workflow[attribute] and workflow[attribute] not in actions:
+            vdirect.module.fail_json(msg="workflow.xml %s '%s' is not one of its actions" % (attribute,
+                                                                                             workflow[attribute]),
+                                     actions=actions)
+
+
+def _sync_workflow_archive(vdirect, workflow_archive, local_digest, workflow, overwrite, check_mode, listed=None):
+    """
+    upload a workflow archive unless its files are those last uploaded for that workflow template
+    :param vdirect:
+    :param workflow_archive: path, or file object of an archive built from a workflow directory
+    :param local_digest: digest of the archive members
+    :param workflow: metadata of workflow.xml
+    :param overwrite:
+    :param check_mode:
+    :param listed: names of the workflow templates on vDirect, when already known
+    :return: changed
+    """
+    workflow_template_name = workflow['name']
 
-    if template_file and template_name:
+    if listed is not None and workflow_template_name not in listed:
+        workflow_exists, revision = False, None
+    else:
+        workflow_exists, revision = vdirect.find_workflow_template(workflow_template_name, with_revision=True)
+    if workflow_exists and not overwrite:
+        vdirect.module.fail_json(msg="Failure creating workflow template. template named %s already exists"
+                                     % workflow_template_name)
+
+    if workflow_exists and vdirect.uploaded_digest('workflowTemplate', workflow_template_name,
+                                                   revision) == local_digest:
+        return False
+
+    if check_mode:
+        return True
+
+    if hasattr(workflow_archive, 'read'):
+        changed = _upload_workflow_archive(vdirect, workflow_exists, workflow_template_name, workflow_archive)
+    else:
+        with vdirect.open_file(workflow_archive) as archive_data:
+            changed = _upload_workflow_archive(vdirect, workflow_exists, workflow_template_name, archive_data)
+    vdirect.record_upload('workflowTemplate', workflow_template_name, local_digest,
+                          vdirect.find_workflow_template(workflow_template_name, with_revision=True)[1])
+    return changed
 
-        template_exists = vdirect.find_template(template_name)
 
-        changed = False
-        file_data = vdirect.read_file(template_file)
-        if overwrite and template_exists:
-            template_source = vdirect.download_template(template_name)
+def _upload_workflow_archive(vdirect, workflow_exists, workflow_template_name, archive_data):
+    if workflow_exists:
+        return vdirect.update_workflow_template(workflow_template_name, archive_data)
+    return vdirect.upload_workflow_template(archive_data)
+
+
+def _load_workflow(vdirect, workflow_source):
+    """
+    :param vdirect:
+    :param workflow_source: workflow source directory or archive
+    :return: (archive path or file object, digest of its members, metadata of workflow.xml)
+    """
+    if os.path.isdir(workflow_source):
+        workflow_archive, local_digest = vdirect.build_workflow_archive(workflow_source)
+    else:
+        workflow_archive, local_digest = workflow_source, vdirect.archive_digest(workflow_source)
+    workflow = vdirect.get_workflow_metadata(workflow_archive)
+    _validate_workflow(vdirect, workflow)
+    return workflow_archive, local_digest, workflow
 
-            if template_source == file_data:
-                changed = False
+
+def _expand_paths(module, patterns):
+    """
+    :param module:
+    :param patterns: paths or glob patterns
+    :return: matching paths, sorted and without duplicates
+    """
+    paths = set()
+    for pattern in patterns:
+        matches = glob.glob(os.path.expanduser(pattern))
+        if not matches:
+            module.fail_json(msg="no file matches %s" % pattern)
+        paths.update(matches)
+    return sorted(paths)
+
+
+def _sync_files(module, vdirect, template_files, workflows, overwrite, concurrency):
+    """
+    synchronize many templates and workflow archives concurrently, and exit the module with the result per file
+    """
+    template_paths = _expand_paths(module, template_files or [])
+    names = [os.path.basename(path) for path in template_paths]
+    duplicates = sorted(set(name for name in names if names.count(name) > 1))
+    if duplicates:
+        module.fail_json(msg="several template files have the same name", names=duplicates)
+    workflow_paths = _expand_paths(module, workflows or [])
+    workflow_names = []
+    for path in workflow_paths:
+        try:
+            workflow_names.append(vdirect.worker().get_workflow_metadata(path)['name'])
+        except Exception:
+            # an invalid workflow is reported in its own result
+            pass
+    duplicates = sorted(set(name for name in workflow_names if workflow_names.count(name) > 1))
+    if duplicates:
+        module.fail_json(msg="several workflows have the same name", names=duplicates)
+
+    listed_templates = vdirect.list_templates() if template_paths else set()
+    listed_workflows = vdirect.list_workflow_templates() if workflow_paths else set()
+
+    def _sync(item):
+        kind, path = item
+        worker = vdirect.worker()
+        result = dict(name=os.path.basename(path))
+        try:
+            if kind == 'template':
+                listed = listed_templates
+                changed = _sync_template(worker, result['name'], path, overwrite, module.check_mode, listed)
             else:
-                if not check_mode and vdirect.update_template(template_name, file_data):
-                    changed = True
-        elif not overwrite and template_exists:
-            module.fail_json(msg="Failure creating template. template named %s already exists" % template_name)
-        elif not template_exists:
-            if not check_mode and vdirect.upload_template(template_name, file_data):
-                changed = True
+                listed = listed_workflows
+                workflow_archive, local_digest, workflow = _load_workflow(worker, path)
+                result['name'] = workflow['name']
+                try:
+                    changed = _sync_workflow_archive(worker, workflow_archive, local_digest, workflow, overwrite,
+                                                     module.check_mode, listed)
+                finally:
+                    if hasattr(workflow_archive, 'close'):
+                        workflow_archive.close()
+        except vDirectError as ex:
+            return dict(ex.result, name=result['name'], status='failed')
+        except Exception as ex:
+            return dict(msg="%s" % ex, name=result['name'], status='failed')
+        if not changed:
+            result['status'] = 'unchanged'
+        else:
+            result['status'] = 'updated' if result['name'] in listed else 'added'
+        return result
 
-        module.exit_json(changed=changed)
+    items = [('template', path) for path in template_paths] + [('workflow', path) for path in workflow_paths]
+    results = dict((item[1], result) for item, result in zip(items, run_concurrently(_sync, items, concurrency)))
 
-    elif workflow_archive:
+    summary = dict((status, 0) for status in ('added', 'updated', 'unchanged', 'failed'))
+    for result in results.values():
+        summary[result['status']] += 1
+    changed = bool(summary['added'] or summary['updated'])
+    if summary['failed']:
+        module.fail_json(msg="failed to synchronize %d of %d files" % (summary['failed'], len(items)),
+                         changed=changed, files=results, summary=summary)
+    module.exit_json(changed=changed, files=results, summary=summary)
 
-        changed = False
-        workflow_template_name, archive_data = vdirect.read_file(workflow_archive, True)
 
-        workflow_exists = vdirect.find_workflow_template(workflow_template_name)
+def main():
+    argument_spec = _augment_arg_spec(vdirect_argument_spec())
 
-        if check_mode:
-            return False
+    module = _create_ansible_module(argument_spec)
+    vdirect = vDirect(module)
 
-        if workflow_exists and overwrite:
-            changed = vdirect.update_workflow_template(workflow_template_name, archive_data)
+    template_name, template_file, overwrite, workflow_archive, workflow_dir, template_files, workflows, \
+        concurrency, show_help = vdirect.get_arg_subset('template_name', 'template_file', 'overwrite',
+                                                        'workflow_archive', 'workflow_dir', 'template_files',
+                                                        'workflows', 'concurrency', 'help')
+    if show_help:
+        module.exit_json(changed=False, usage="Uploads provided file/archive to vDirect")
+
+    check_mode = module.check_mode
 
-        elif not overwrite and workflow_exists:
-            module.fail_json(msg="Failure creating workflow template. template named %s already exists"
-                                 % workflow_template_name)
+    if template_files or workflows:
+        _sync_files(module, vdirect, template_files, workflows, overwrite, concurrency)
 
-        elif not workflow_exists:
-            changed = vdirect.upload_workflow_template(archive_data)
+    elif template_file and template_name:
+        module.exit_json(changed=_sync_template(vdirect, template_name, template_file, overwrite, check_mode))
 
-        module.exit_json(changed=changed)
+    elif workflow_archive or workflow_dir:
+        if workflow_dir:
+            workflow_archive, local_digest = vdirect.build_workflow_archive(workflow_dir)
+        else:
+            local_digest = vdirect.archive_digest(workflow_archive)
+        workflow = vdirect.get_workflow_metadata(workflow_archive)
+        _validate_workflow(vdirect, workflow)
+        module.exit_json(changed=_sync_workflow_archive(vdirect, workflow_archive, local_digest, workflow, overwrite,
+                                                        check_mode),
+                         workflow=workflow)
 
     else:
         module.exit_json(msg="invalid arguments supplied")
 
+import glob
+
 # standard ansible module imports
 from ansible.module_utils.basic import *
 from ansible.module_utils.vdirect_api import *
@@ -0,0 +1,179 @@
+#!/usr/bin/python
+# (c) 2016, Radware LTD.
+
+# This file is part of Ansible
+#
+# Ansible is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Ansible is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+
+DOCUMENTATION = """
+---
+module: vdirect_job_status
+short_description: Check or wait for asynchronous vDirect operations
+description:
+    - This module checks the status of workflow operations started by M(vdirect_workflow) with sync=false,
+      and optionally waits for all of them to complete.
+version_added: "2.1"
+extends_documentation_fragment: vdirect_api
+options:
+  jobs:
+    description:
+      - Status uris of the operations, as returned in I(job) (or I(operations)) by M(vdirect_workflow).
+    required: True
+    aliases: [ 'job', 'uris' ]
+    version_added: "2.1"
+  wait:
+    description:
+      - True - Wait for all operations to complete (default).
+      - False - Check the status of every operation once.
+    required: False
+    default: True
+    version_added: "2.1"
+  async_delay:
+    description:
+      - Maximum delay between status checks of an operation, in seconds.
+    required: False
+    default: 2
+    version_added: "2.1"
+  async_timeout:
+    description:
+      - Number of seconds to wait for the operations to complete before failing. 0 waits until they complete.
+    required: False
+    default: 0
+    version_added: "2.1"
+  concurrency:
+    description:
+      - Maximum number of status checks at the same time when I(wait=false).
+    required: False
+    default: 10
+    version_added: "2.1"
+  device_name:
+    description:
+      - Not used by this module. Overwritten to required=False.
+    required: False
+    version_added: "2.1"
+notes:
+   - The module fails when an operation failed or did not complete within I(async_timeout).
+   - Only uris of I(vdirect_ip) or I(secondary_vdirect_ip) are accepted.
+"""
+
+EXAMPLES = """
+# start an action on two workflows, then wait for both
+# (added base vdirect_api mandatory params)
+- vdirect_workflow:
+    vdirect_ip: 127.0.0.1
+    username: user
+    password: password
+    action: update_idle
+    workflow_name: "{{ item }}"
+    idle_time: 500
+    sync: false
+  with_items: [idle1, idle2]
+  register: started
+
+- vdirect_job_status:
+    vdirect_ip: 127.0.0.1
+    username: user
+    password: password
+    jobs: "{{ started.results | map(attribute='job') | list }}"
+"""
+
+RETURN = """
+jobs:
+    description: Status per operation - uri, complete, and once complete success, duration, log, polls and wait.
+    returned: always
+    type: list
+    sample: "{ 'jobs': [{'uri': '...', 'complete': true, 'success': true, 'duration': 2, 'polls': 4}]}"
+"""
+
+
+def _augment_arg_spec(arg_spec):
+    """
+    add module arguments
+    :param arg_spec:
+    :return:
+    """
+    arg_spec.update(
+        dict(
+            jobs=dict(type='list', required=True, aliases=['job', 'uris']),
+            wait=dict(type='bool', required=False, default='true'),
+            async_delay=dict(type='int', required=False, default=2),
+            async_timeout=dict(type='int', required=False, default=0),
+            concurrency=dict(type='int', required=False, default=10),
+            # overwriting device name. not needed for this module.
+            device_name=dict(type='str', required=False)
+        )
+    )
+    return arg_spec
+
+
+def _create_ansible_module(arg_spec, check_invalid_args=True):
+    """
+    create AnsibleModule instance
+    :param arg_spec:
+    :param check_invalid_args:
+    :return:
+    """
+    module = AnsibleModule(
+        arg_spec,
+        supports_check_mode=True,
+        check_invalid_arguments=check_invalid_args,
+    )
+    return module
+
+
+def main():
+    argument_spec = _augment_arg_spec(vdirect_argument_spec())
+
+    module = _create_ansible_module(argument_spec)
+    vdirect = vDirect(module)
+
+    jobs, wait, async_delay, async_timeout, concurrency, show_help = vdirect.get_arg_subset('jobs',
+                                                                                            'wait',
+                                                                                            'async_delay',
+                                                                                            'async_timeout',
+                                                                                            'concurrency',
+                                                                                            'help')
+    if show_help:
+        module.exit_json(changed=False, usage="checks or waits for asynchronous vDirect operations")
+
+    foreign = [uri for uri in jobs if not vdirect.is_vdirect_uri(uri)]
+    if foreign:
+        module.fail_json(msg="job uris must point to the vDirect server", jobs=foreign)
+
+    if wait:
+        results = vdirect.wait_async_operations([dict(uri=uri, complete=False) for uri in jobs],
+                                                async_delay, async_timeout)
+    else:
+        results = vdirect.get_async_status(jobs, concurrency)
+
+    output = []
+    for uri, result in zip(jobs, results):
+        job = dict(result, uri=uri)
+        job['complete'] = 'success' in result
+        if 'messages' in job:
+            job['log'] = job.pop('messages')
+        output.append(job)
+
+    failed = len([job for job in output if job['failed']])
+    if failed:
+        module.fail_json(msg="%d of %d operations failed" % (failed, len(output)), jobs=output)
+
+    module.exit_json(changed=False, jobs=output)
+
+# standard ansible module imports
+from ansible.module_utils.basic import *
+from ansible.module_utils.vdirect_api import *
+
+if __name__ == '__main__':
+    main()
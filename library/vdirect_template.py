@@ -44,11 +44,47 @@ options:
     required: False
     default: False
     version_added: "2.1"
+  change_detection:
+    description:
+      - How the 'diff' results before and after executing the template are compared.
+      - digest - Each diff is hashed while it is downloaded and only the digests are compared.
+        An unchanged diff (same ETag) is not downloaded again.
+      - full - Both diffs are downloaded and compared as a whole.
+    required: False
+    default: digest
+    choices: ['digest', 'full']
+    version_added: "2.1"
+  devices:
+    description:
+      - Execute the template on several devices in one module call, instead of on I(device_name).
+      - Each item is a device name, or a dictionary with the device I(name) and optional I(parameters)
+        overriding the template parameters given to the module for that device.
+      - The template is validated once and executed on up to I(concurrency) devices at the same time.
+    required: False
+    default: None
+    version_added: "2.1"
+  concurrency:
+    description:
+      - Maximum number of devices the template is executed on at the same time when I(devices) is used.
+    required: False
+    default: 10
+    version_added: "2.1"
+  dry_run_cache_ttl:
+    description:
+      - Number of seconds the result of a check mode dry run is kept in I(cache_dir) and returned again, without
+        asking vDirect, for the same template revision (ETag), device and parameters.
+      - Set to 0 to always run the dry run on vDirect, for instance for templates whose output depends on the
+        current configuration of the device.
+    required: False
+    default: 3600
+    version_added: "2.1"
 notes:
    - If supported by the device, the module determines whether or not the template execution made changes
      to the device's configuration by executing the 'diff' command before and
      after executing the template, and comparing the results.
    - Check mode is supported. Check mode will dry run the template against the device and will report errors, if any.
+     Dry run results are reused for I(dry_run_cache_ttl) seconds, and only when vDirect reports a revision (ETag)
+     for the template, so uploading a new version of the template runs the dry run again.
    - I(help) will provide information about the parameters required for executing the I(template_name)
 """
 
@@ -76,6 +112,22 @@ EXAMPLES = """
     template_name: idle.vm
     idle_time: 500
     extra: "ok"
+
+# execute the idle.vm configuration template on three devices,
+# with a different idle_time for alteon3
+# (added base vdirect_api mandatory params)
+- vdirect_template:
+    vdirect_ip: 127.0.0.1
+    username: user
+    password: password
+    template_name: idle.vm
+    idle_time: 500
+    devices:
+      - alteon1
+      - alteon2
+      - name: alteon3
+        parameters:
+          idle_time: 300
 """
 
 
@@ -85,6 +137,16 @@ facts:
     returned: success, when changed
     type: json object
     sample: "{ 'facts': {'real_server': {'address': '...', 'name': '...', 'port': 80, 'weight': 1}}"
+devices:
+    description: Result per device when I(devices) is used - changed, failed, duration and facts or msg.
+    returned: when devices is used
+    type: json object
+    sample: "{ 'devices': {'alteon1': {'changed': true, 'failed': false, 'duration': 1.2, 'facts': {...}}}}"
+dry_run_cached:
+    description: Whether the dry run result was taken from I(cache_dir) instead of vDirect.
+    returned: in check mode, when devices is not used
+    type: boolean
+    sample: "{ 'dry_run_cached': true }"
 """
 
 
@@ -97,7 +159,13 @@ def _augment_arg_spec(arg_spec):
     arg_spec.update(
         dict(
             template_name=dict(type='str', required=True, aliases=['template', 'tmpl']),
-            commit_changes=dict(type='bool', required=False, default='false', aliases=['commit', 'apply', 'save'])
+            commit_changes=dict(type='bool', required=False, default='false', aliases=['commit', 'apply', 'save']),
+            change_detection=dict(type='str', required=False, default='digest', choices=['digest', 'full']),
+            devices=dict(type='list', required=False),
+            concurrency=dict(type='int', required=False, default=10),
+            dry_run_cache_ttl=dict(type='int', required=False, default=3600),
+            # device_name is not needed when executing on a list of devices
+            device_name=dict(type='str', required=False, aliases=['device'])
         )
     )
     return arg_spec
@@ -114,10 +182,87 @@ def _create_ansible_module(arg_spec, check_invalid_args=True):
         arg_spec,
         supports_check_mode=True,
         check_invalid_arguments=check_invalid_args,
+        mutually_exclusive=(
+            ['device_name', 'devices'],
+        ),
     )
     return module
 
 
+def _template_facts(resp, data, check_mode):
+    """
+    output parameters of a template execution
+    :param resp:
+    :param data:
+    :param check_mode:
+    :return:
+    """
+    result = dict()
+
+    if check_mode:
+        for di in ['cliOutput', 'generatedScript']:
+            if di in resp:
+                result[di] = resp[di]
+        result['sent_params'] = data
+
+    result.update(resp.get('parameters', dict()))
+    return result
+
+
+def _parse_devices(module, vdirect, devices, template_args, template_argument_spec):
+    """
+    build the (device_name, template_args) list for batch execution.
+    the parameters of every device are validated with template_argument_spec, like the module parameters
+    :param module:
+    :param vdirect:
+    :param devices:
+    :param template_args: parameters supplied to the module
+    :param template_argument_spec:
+    :return:
+    """
+    parsed = []
+    for device in devices:
+        if isinstance(device, dict):
+            if 'name' not in device:
+                module.fail_json(msg="devices items must have a name", device=device)
+            device_name = device['name']
+            overrides = device.get('parameters') or {}
+        else:
+            device_name, overrides = device, {}
+
+        device_args = dict(template_args)
+        device_args.update(overrides)
+        parsed.append((device_name, vdirect.check_params(template_argument_spec, device_args,
+                                                         "device %s" % device_name)))
+    return parsed
+
+
+def _execute_batch(module, vdirect, template_name, devices, check_mode, change_detection, commit_changes,
+                   concurrency, dry_run_ttl):
+    """
+    execute the template on all devices and exit the module with the per device results
+    """
+    results = vdirect.execute_template_batch(template_name, devices, check_mode, change_detection,
+                                             commit_changes, concurrency, dry_run_ttl)
+
+    device_results = {}
+    for device_name, result in results.items():
+        if isinstance(result, vDirectError):
+            device_results[device_name] = dict(result.result, changed=False, failed=True)
+        else:
+            resp, data, changed, duration = result
+            device_results[device_name] = dict(changed=changed, failed=False, duration=duration,
+                                               facts=_template_facts(resp, data, check_mode))
+
+    changed = any(result['changed'] for result in device_results.values())
+    failed = [name for name, result in device_results.items() if result['failed']]
+    if failed:
+        module.fail_json(msg="template execution failed on %d of %d devices" % (len(failed), len(devices)),
+                         failed_devices=failed, changed=changed, devices=device_results)
+
+    module.exit_json(changed=changed, devices=device_results)
+
+
 def main():
     # add template parameters
     argument_spec = _augment_arg_spec(vdirect_argument_spec())
@@ -125,10 +270,18 @@ def main():
     module = _create_ansible_module(argument_spec, False)
     vdirect = vDirect(module)
 
-    template_name, device_name, show_help, commit_changes = vdirect.get_arg_subset('template_name',
-                                                                                   'device_name',
-                                                                                   'help',
-                                                                                   'commit_changes')
+    template_name, device_name, show_help, commit_changes, change_detection, devices, concurrency, dry_run_ttl = \
+        vdirect.get_arg_subset('template_name',
+                               'device_name',
+                               'help',
+                               'commit_changes',
+                               'change_detection',
+                               'devices',
+                               'concurrency',
+                               'dry_run_cache_ttl')
+
+    if not device_name and not devices and not show_help:
+        module.fail_json(msg="one of the following is required: device_name, devices")
 
     check_mode = module.check_mode
 
@@ -137,7 +290,11 @@ def main():
     if show_help:
         vdirect.module.exit_json(changed=False, usage=template_argument_spec)
 
-    argument_spec.update(template_argument_spec)
+    if devices:
+        # required parameters may be supplied per device, they are checked by _parse_devices
+        argument_spec.update(dict((key, dict(spec, required=False)) for key, spec in template_argument_spec.items()))
+    else:
+        argument_spec.update(template_argument_spec)
 
     # with additional parameters
     module = vdirect.module = _create_ansible_module(argument_spec)
@@ -147,17 +304,15 @@ def main():
         if key in template_argument_spec:
             template_args[key] = module.params[key]
 
-    resp, info, data, changed = vdirect.execute_template(template_name, template_args, check_mode)
-
-    result = dict()
+    if devices:
+        _execute_batch(module, vdirect, template_name,
+                       _parse_devices(module, vdirect, devices, template_args, template_argument_spec),
+                       check_mode, change_detection, commit_changes, concurrency, dry_run_ttl)
 
-    if module.check_mode:
-        for di in ['cliOutput', 'generatedScript']:
-            if di in resp:
-                result[di] = resp[di]
-        result['sent_params'] = data
+    resp, info, data, changed = vdirect.execute_template(template_name, template_args, check_mode, change_detection,
+                                                         dry_run_ttl)
 
-    result.update(resp.get('parameters', dict()))
+    result = _template_facts(resp, data, check_mode)
 
     if not check_mode and commit_changes:
         changed = vdirect.commit()
@@ -166,6 +321,9 @@ def main():
         changed=changed,
     )
 
+    if check_mode:
+        output['dry_run_cached'] = bool(info.get('cached'))
+
     if result:
         output.update(
             dict(
@@ -51,7 +51,8 @@ options:
   workflow_name:
     description:
       - The name of workflow to create/delete/run action with.
-    required: True
+      - Required unless I(operations) is used.
+    required: False
     aliases: ['wf']
     version_added: "2.1"
   action:
@@ -62,16 +63,42 @@ options:
   sync:
     description:
       - True - Wait for the operation to finish (default).
-      - False - Fire and forget mode.
+      - False - Fire and forget mode. The module returns the I(job) uri of the operation,
+        which M(vdirect_job_status) can wait for later.
     default: True
     required: False
     version_added: "2.1"
   async_delay:
     description:
-      - Length of delay between status checks on synchronous operations, in seconds.
+      - Maximum delay between status checks on synchronous operations, in seconds.
+      - The first checks are done a fraction of a second apart, the delay then doubles (with jitter) up to async_delay.
     required: False
     default: 2
     version_added: "2.1"
+  async_timeout:
+    description:
+      - Number of seconds to wait for a synchronous operation to complete before failing.
+      - 0 waits until the operation completes.
+    required: False
+    default: 0
+    version_added: "2.1"
+  operations:
+    description:
+      - Run several workflow operations in one module call, instead of the single operation described by
+        I(operation), I(workflow_name), I(action) and I(workflow_template_name).
+      - Each item is a dictionary with I(operation) (default action), I(workflow_name), I(action),
+        I(workflow_template_name) and I(parameters), the workflow template/action parameters (including devices).
+      - All operations are started first, then waited for together, so the module completes when the slowest
+        operation completes.
+    required: False
+    default: None
+    version_added: "2.1"
+  concurrency:
+    description:
+      - Maximum number of I(operations) started at the same time.
+    required: False
+    default: 10
+    version_added: "2.1"
 notes:
    - Workflow operations can be quite lengthy (depending on the workflow sequences).
    - The module is not idempotent. Rerunning the module will attempt to performe the action requested again.
@@ -113,6 +140,24 @@ EXAMPLES = """
     operation: delete
     workflow_name: idle
 
+# execute the update_idle workflow action on three workflows and wait for all of them
+# (added base vdirect_api mandatory params)
+- vdirect_workflow:
+    vdirect_ip: 127.0.0.1
+    username: user
+    password: password
+    operations:
+      - workflow_name: idle1
+        action: update_idle
+        parameters:
+          idle_time: 500
+      - workflow_name: idle2
+        action: update_idle
+        parameters:
+          idle_time: 500
+      - operation: delete
+        workflow_name: idle3
+
 """
 
 
@@ -122,6 +167,27 @@ facts:
     returned: on successful execution.
     type: json object
     sample: "{ 'facts': { 'changed': true, 'duration': ss, 'log': ['...', '...']}}"
+polls:
+    description: Number of status checks done while waiting for the operation to complete.
+    returned: on synchronous execution.
+    type: int
+    sample: 5
+wait:
+    description: Seconds spent waiting for the operation to complete.
+    returned: on synchronous execution.
+    type: float
+    sample: 3.25
+job:
+    description: Status uri of the started operation, for use with M(vdirect_job_status).
+    returned: when sync is false
+    type: string
+    sample: "https://127.0.0.1:2189/api/runnable/Workflow/idle/update_idle/42"
+operations:
+    description: Result per item of I(operations) - changed, failed, duration, log, polls and wait, or msg.
+      When sync is false, the status uri of each started operation.
+    returned: when operations is used
+    type: list
+    sample: "{ 'operations': [{'workflow_name': 'idle1', 'action': 'update_idle', 'changed': true, 'duration': 2}]}"
 """
 
 
@@ -136,9 +202,12 @@ def _augment_arg_spec(arg_spec):
             operation=dict(type='str', required=False, default='action', choices=['create', 'delete', 'action']),
             action=dict(type='str', required=False),
             workflow_template_name=dict(type='str', required=False, aliases=['template', 'tmpl']),
-            workflow_name=dict(type='str', required=True, aliases=['wf']),
+            workflow_name=dict(type='str', required=False, aliases=['wf']),
             sync=dict(type='bool', required=False, default='true'),
             async_delay=dict(type='int', required=False, default=2),
+            async_timeout=dict(type='int', required=False, default=0),
+            operations=dict(type='list', required=False),
+            concurrency=dict(type='int', required=False, default=10),
             # overwriting device name. not needed for this module.
             device_name = dict(type='str', required=False, defaultValue='adc')
         )
@@ -159,35 +228,104 @@ def _create_ansible_module(arg_spec, check_invalid_args=True):
         check_invalid_arguments=check_invalid_args,
         mutually_exclusive=(
             ['workflow_template_name', 'action'],
+            ['operations', 'workflow_name'],
         ),
     )
     return module
 
 
-def validate_arg_spec(module, operation, action, workflow_template_name, sync, async_delay):
+def _operation_error(operation, action, workflow_template_name):
     """
-    check module arguments.
-    :param module:
+    check the arguments of a workflow operation
     :param operation:
     :param action:
     :param workflow_template_name:
-    :param sync:
-    :param async_delay:
+    :return: error message, None when the arguments are valid
     """
+    if operation not in ('create', 'delete', 'action'):
+        return "operation must be one of create, delete, action"
+
     if operation == 'create' and not workflow_template_name:
-        module.fail_json(msg="operation: create requires value for workflow_template_name")
+        return "operation: create requires value for workflow_template_name"
 
     if operation == 'action' and workflow_template_name:
-        module.fail_json(msg="operation: action (the default) is mutually exclusive with workflow_template_name")
+        return "operation: action (the default) is mutually exclusive with workflow_template_name"
 
     if operation == 'action' and not action:
-        module.fail_json(msg="operation: action requires value for action")
+        return "operation: action requires value for action"
 
     if operation != 'action' and action:
-        module.fail_json(msg="operation: create|delete are mutually exclusive with action")
+        return "operation: create|delete are mutually exclusive with action"
+
+    return None
+
+
+def validate_operations(module, operations):
+    """
+    check the items of the operations argument
+    :param module:
+    :param operations:
+    """
+    for item in operations:
+        if not isinstance(item, dict) or not item.get('workflow_name'):
+            module.fail_json(msg="operations items must be dictionaries with a workflow_name", item=item)
+        if not isinstance(item.get('parameters') or {}, dict):
+            module.fail_json(msg="parameters of operations items must be dictionaries", item=item)
+
+        error = _operation_error(item.get('operation') or 'action', item.get('action'),
+                                 item.get('workflow_template_name'))
+        if error:
+            module.fail_json(msg=error, item=item)
+
+
+def validate_arg_spec(module, operation, action, workflow_template_name, sync, async_timeout):
+    """
+    check module arguments.
+    :param module:
+    :param operation:
+    :param action:
+    :param workflow_template_name:
+    :param sync:
+    :param async_timeout:
+    """
+    error = _operation_error(operation, action, workflow_template_name)
+    if error:
+        module.fail_json(msg=error)
+
+    if async_timeout and sync is False:
+        module.fail_json(msg="async_timeout affects synchronous operations only. set sync: true and try again")
+
+
+def _execute_operations(module, vdirect, operations, sync, async_delay, async_timeout, concurrency):
+    """
+    run the items of the operations argument and exit the module with the per item results.
+    check mode only validates the parameters of every item
+    """
+    check_mode = module.check_mode
+    results = vdirect.execute_workflow_operations(operations, sync, async_delay, async_timeout, concurrency,
+                                                  check_mode)
+
+    output = []
+    for item, result in zip(operations, results):
+        item_output = dict((key, item[key]) for key in ('operation', 'workflow_name', 'action',
+                                                        'workflow_template_name') if item.get(key))
+        if 'success' in result:
+            item_output.update(changed=bool(result['success']), failed=result['failed'],
+                               duration=result['duration'], polls=result['polls'], wait=result['wait'])
+            if result['messages']:
+                item_output['log'] = result['messages']
+        else:
+            item_output.update(result, changed=not result['failed'] and not check_mode)
+        output.append(item_output)
+
+    changed = any(item['changed'] for item in output)
+    failed = len([item for item in output if item['failed']])
+    if failed:
+        module.fail_json(msg="%d of %d operations failed" % (failed, len(output)), changed=changed,
+                         operations=output)
+
+    module.exit_json(changed=changed, operations=output)
 
-    if async_delay and sync is False:
-        module.fail_json(msg="async_delay affect synchronous operations only. set sync: true and try again")
 
 def main():
     argument_spec = _augment_arg_spec(vdirect_argument_spec())
@@ -195,15 +333,27 @@ def main():
     module = _create_ansible_module(argument_spec, False)
     vdirect = vDirect(module)
 
-    operation, action, workflow_template_name, workflow_name, sync, async_delay= vdirect.get_arg_subset(
-        'operation',
-        'action',
-        'workflow_template_name',
-        'workflow_name',
-        'sync',
-        'async_delay')
+    operation, action, workflow_template_name, workflow_name, sync, async_delay, async_timeout, operations, \
+        concurrency = vdirect.get_arg_subset('operation',
+                                             'action',
+                                             'workflow_template_name',
+                                             'workflow_name',
+                                             'sync',
+                                             'async_delay',
+                                             'async_timeout',
+                                             'operations',
+                                             'concurrency')
+
+    if operations:
+        # workflow parameters are given per item, the module takes no others
+        module = vdirect.module = _create_ansible_module(argument_spec)
+        validate_operations(module, operations)
+        _execute_operations(module, vdirect, operations, sync, async_delay, async_timeout, concurrency)
+
+    if not workflow_name:
+        module.fail_json(msg="one of the following is required: workflow_name, operations")
 
-    validate_arg_spec(module, operation, action, workflow_template_name, sync, async_delay)
+    validate_arg_spec(module, operation, action, workflow_template_name, sync, async_timeout)
 
     check_mode = module.check_mode
 
@@ -211,7 +361,7 @@ def main():
         module = vdirect.module = _create_ansible_module(argument_spec)
         if check_mode:
             module.exit_json(changed=False)
-        success, messages, duration = vdirect.delete_workflow(workflow_name, sync=sync, async_delay=async_delay)
+        resp = vdirect.submit_delete_workflow(workflow_name)
 
     if operation == 'create':
         ansible_workflow_arg_spec = vdirect.get_workflow_params(workflow_template_name)
@@ -225,8 +375,7 @@ def main():
         for key in module.params:
             if key in ansible_workflow_arg_spec:
                 workflow_args[key] = module.params[key]
-        success, messages, duration = vdirect.execute_create_workflow(workflow_template_name, workflow_name,
-                                                                      workflow_args, sync=sync, async_delay=async_delay)
+        resp = vdirect.submit_create_workflow(workflow_template_name, workflow_name, workflow_args)
 
     if operation == 'action':
         ansible_workflow_arg_spec = vdirect.get_workflow_params(workflow_name, action)
@@ -240,23 +389,26 @@ def main():
         for key in module.params:
             if key in ansible_workflow_arg_spec:
                 action_args[key] = module.params[key]
-        success, messages, duration = vdirect.execute_workflow_action(workflow_name, action,
-                                                                      action_args, sync=sync, async_delay=async_delay)
+        resp = vdirect.submit_workflow_action(workflow_name, action, action_args)
+
+    if not sync:
+        # fire and forget. vdirect_job_status can wait for the operation later
+        module.exit_json(changed=True, job=resp.get('uri'))
+
+    success, messages, duration, polling = vdirect.async_execute(async_delay, resp, async_timeout)
 
     if success:
-        output = dict(changed=success, duration=duration)
+        output = dict(changed=success, duration=duration, **polling)
         if len(messages):
             output.update(dict(log=messages))
         module.exit_json(**output)
     else:
-        output = dict(msg="operation failed", duration=duration)
+        output = dict(msg="operation failed", duration=duration, **polling)
         if len(messages):
             output.update(dict(log=messages))
         module.fail_json(**output)
 
 
-
-
 # standard ansible module imports
 from ansible.module_utils.basic import *
 from ansible.module_utils.vdirect_api import *
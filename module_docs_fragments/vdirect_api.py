@@ -88,4 +88,102 @@ class ModuleDocFragment(object):
           required: false
           default: no
           version_added: "2.1"
+        cache_dir:
+          description:
+            - Directory on the ansible controller used to keep vDirect information between module runs.
+            - Template and workflow parameter definitions are kept there as well. They are revalidated with their ETag
+              when vDirect provides one, and otherwise reused for I(cache_ttl) seconds.
+              M(vdirect_file) drops them when it uploads a new version.
+            - An empty value disables the controller cache.
+          required: false
+          default: ~/.ansible/vdirect_cache
+          version_added: "2.1"
+        cache_ttl:
+          description:
+            - Number of seconds the active vDirect of the HA pair and the vDirect version are kept in I(cache_dir).
+              This also applies to parameter definitions vDirect returns without an ETag.
+            - The cached entry is dropped when vDirect can not be reached or answers with 503 or an unexpected 404.
+            - Set to 0 to probe vDirect on every module run.
+          required: false
+          default: 300
+          version_added: "2.1"
+        keepalive:
+          description:
+            - Reuse keep-alive connections (and TLS sessions, where python supports it) for all requests
+              of a module run.
+            - The number of connections opened and reused is returned in I(connections).
+            - When set to false, or when python lacks ssl contexts (before 2.7.9), every request opens a new connection.
+            - Requests a proxy of the environment (http_proxy, https_proxy, no_proxy) applies to are sent through
+              that proxy by fetch_url, without keep-alive connections or I(broker_socket).
+          required: false
+          default: yes
+          version_added: "2.1"
+        trace_file:
+          description:
+            - Append the timings of every request to vDirect to this file, one JSON object per line.
+            - The same timings are always returned in I(timings), with totals and one entry per request -
+              method, url (object names replaced by placeholders), status, bytes_out, bytes_in, ttfb and total,
+              auth (basic or session), and for requests that opened a connection dns, connect and tls.
+              Durations are in seconds.
+          required: false
+          default: null
+          version_added: "2.1"
+        broker_socket:
+          description:
+            - Send the requests through the broker started by M(vdirect_broker) on this unix socket, which keeps
+              connections to vDirect open across module runs.
+            - The number of requests sent through the broker is returned in I(broker).
+            - Requests use the module's own connections when no broker listens on the socket. Set to an empty
+              string to never use the broker.
+          required: false
+          default: ~/.ansible/vdirect_broker.sock
+          version_added: "2.1"
+        session_ttl:
+          description:
+            - Number of seconds the session cookie vDirect returns is reused, by this and later module runs, instead
+              of sending the credentials with every request. Sessions are kept in I(cache_dir), per vDirect server
+              and user, in files only readable by the controller user.
+            - A session vDirect no longer accepts is renewed with the credentials.
+            - Set to 0 to send the credentials with every request.
+          required: false
+          default: 600
+          version_added: "2.1"
+        probe_timeout:
+          description:
+            - Number of seconds to wait for the members of the HA pair (I(vdirect_ip) and I(secondary_vdirect_ip)) to
+              tell which one is active. Both are asked at once, and the first to answer as active is used.
+            - The members asked, their answers and the time taken are returned in I(ha).
+          required: false
+          default: 5
+          version_added: "2.1"
+        coalesce:
+          description:
+            - Let module processes running at the same time on the controller, such as the forks of a play, share
+              the requests that find the active vDirect and its version, and those that get template and workflow
+              parameter definitions. The first process sends the request, and the others wait for it and use its
+              result from I(cache_dir).
+            - Other requests, such as device diffs, are never shared.
+            - The number of results shared and the seconds waited for them are returned in I(coalesced).
+            - Requires I(cache_dir) and a platform with fcntl.
+          required: false
+          default: no
+          version_added: "2.1"
+        rate_limit:
+          description:
+            - Maximum number of requests per second sent to vDirect (the HA pair) by all module processes running on
+              the controller, such as the forks of a play. Up to one second worth of requests may be sent at once.
+            - Requests over the limit wait for their turn. The time requests waited for I(rate_limit) and
+              I(max_in_flight) is returned in I(queued), and per request in I(timings).
+            - Requires I(cache_dir) and a platform with fcntl. Set to 0 for no limit.
+          required: false
+          default: 0
+          version_added: "2.1"
+        max_in_flight:
+          description:
+            - Maximum number of requests vDirect (the HA pair) is processing at the same time for all module
+              processes running on the controller. A request counts until vDirect starts to answer it.
+            - Requires I(cache_dir) and a platform with fcntl. Set to 0 for no limit.
+          required: false
+          default: 0
+          version_added: "2.1"
 """
\ No newline at end of file
@@ -20,11 +20,50 @@
 ALLOWED_PARAM_TYPES = ['string', 'int', 'ip', 'bool', 'ipv4', 'ipv6', 'adcService']
 STRING_PARAM_TYPES = ['ip', 'ipv4', 'ipv6', 'string', 'adcService']
 
+# size of the blocks read when streaming request and response bodies
+CHUNK_SIZE = 64 * 1024
+
+# request bodies larger than this are spooled to disk by the broker
+BROKER_SPOOL_SIZE = 1024 * 1024
+
+# workflow archives built from a directory are kept in memory up to this size
+ARCHIVE_SPOOL_SIZE = 8 * 1024 * 1024
+
+# timestamp of every entry of a built workflow archive, the earliest a zip file can hold
+ARCHIVE_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+# vDirect object types whose urls carry the object name, api/<type>/<name>
+URL_OBJECT_TYPES = ['template', 'workflowTemplate', 'workflow', 'adc', 'defensePro', 'appWall', 'container']
+
+# methods a request may be sent again with, when vDirect closed an idle connection before answering
+IDEMPOTENT_METHODS = ['GET', 'HEAD', 'PUT', 'DELETE', 'OPTIONS']
+
+# session cookie vDirect sets on authenticated responses
+SESSION_COOKIE = 'JSESSIONID'
+
+# first delay between status checks of an async operation, in seconds. doubled after every check
+ASYNC_FIRST_DELAY = 0.25
+
 try:
+    import copy
+    import errno
+    import hashlib
     import inspect
     import json
+    import os
+    import random
+    import shutil
+    import struct
+    import tempfile
+    import threading
     import zipfile
-    from xml.dom import minidom
+    try:
+        import Queue as queue
+        import urlparse
+    except ImportError:
+        import queue
+        import urllib.parse as urlparse
+    from xml.parsers import expat
     from xml.parsers.expat import ExpatError
     import time
 
@@ -32,6 +71,32 @@ try:
 except ImportError:
     HAS_LIBS = False
 
+try:
+    import base64
+    import socket
+    import ssl
+    try:
+        import httplib
+        import SocketServer as socketserver
+        from urllib import getproxies, proxy_bypass
+    except ImportError:
+        import http.client as httplib
+        import socketserver
+        from urllib.request import getproxies, proxy_bypass
+
+    # keep-alive requests need ssl contexts (python 2.7.9 and later)
+    HAS_KEEPALIVE = hasattr(ssl, 'create_default_context')
+except ImportError:
+    HAS_KEEPALIVE = False
+
+try:
+    # locks shared by the module processes of the controller (posix only)
+    import fcntl
+
+    HAS_FCNTL = True
+except ImportError:
+    HAS_FCNTL = False
+
 from ansible.module_utils.urls import fetch_url
 
 
@@ -51,7 +116,17 @@ def vdirect_argument_spec():
         validate_certs=dict(type='bool', default='yes'),
         device_type=dict(type='str', default='alteon'),
         device_name=dict(type='str', required=True, aliases=['device']),
-        help=dict(type='bool', required=False, default='no')
+        help=dict(type='bool', required=False, default='no'),
+        cache_dir=dict(type='str', required=False, default='~/.ansible/vdirect_cache'),
+        cache_ttl=dict(type='int', required=False, default=300),
+        keepalive=dict(type='bool', required=False, default='yes'),
+        trace_file=dict(type='str', required=False),
+        broker_socket=dict(type='str', required=False, default='~/.ansible/vdirect_broker.sock'),
+        session_ttl=dict(type='int', required=False, default=600),
+        probe_timeout=dict(type='int', required=False, default=5),
+        coalesce=dict(type='bool', required=False, default='no'),
+        rate_limit=dict(type='float', required=False, default=0),
+        max_in_flight=dict(type='int', required=False, default=0)
     )
 
 
@@ -72,9 +147,779 @@ def vdirect_parse_arguments(module):
         _get_param('device_type'),
         _get_param('device_name'),
         _get_param('help'),
+        _get_param('cache_dir'),
+        _get_param('cache_ttl'),
+        _get_param('keepalive'),
+        _get_param('trace_file'),
+        _get_param('broker_socket'),
+        _get_param('session_ttl'),
+        _get_param('probe_timeout'),
+        _get_param('coalesce'),
+        _get_param('rate_limit'),
+        _get_param('max_in_flight'),
     )
 
 
+class vDirectError(Exception):
+    """
+    failure of a vDirect operation running in a worker thread.
+    result holds the arguments that would have been passed to fail_json
+    """
+
+    def __init__(self, result):
+        Exception.__init__(self, result.get('msg', ''))
+        self.result = result
+
+
+class _WorkerModule(object):
+    """
+    AnsibleModule stand-in for worker threads.
+    fail_json raises vDirectError instead of ending the module process, so one failing device
+    does not abort the operations running for the others
+    """
+
+    # worker results are collected by the main thread, which reports client information once
+    _vdirect_wrapped = True
+
+    def __init__(self, module):
+        self._module = module
+        # requests change the credential parameters fetch_url reads, each thread changes its own copy
+        self.params = dict(module.params)
+
+    def __getattr__(self, name):
+        return getattr(self._module, name)
+
+    def fail_json(self, **kwargs):
+        raise vDirectError(kwargs)
+
+    def exit_json(self, **kwargs):
+        raise vDirectError(dict(msg="unexpected exit_json in worker thread", result=kwargs))
+
+
+def run_concurrently(func, items, concurrency):
+    """
+    call func for every item with at most concurrency threads
+    :param func:
+    :param items:
+    :param concurrency:
+    :return: results, in the order of items
+    """
+    results = [None] * len(items)
+    pending = queue.Queue()
+    for index, item in enumerate(items):
+        pending.put((index, item))
+
+    def _worker():
+        while True:
+            try:
+                index, item = pending.get_nowait()
+            except queue.Empty:
+                return
+            results[index] = func(item)
+
+    workers = [threading.Thread(target=_worker) for _ in range(max(1, min(concurrency, len(items))))]
+    for worker in workers:
+        worker.daemon = True
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return results
+
+
+def _wrap_module_results(module, result_extras):
+    """
+    add vDirect client information to every exit_json/fail_json of the module
+    :param module:
+    :param result_extras: callable returning a dict
+    """
+    if getattr(module, '_vdirect_wrapped', False):
+        return
+
+    exit_json, fail_json = module.exit_json, module.fail_json
+
+    def _exit_json(**kwargs):
+        for key, value in result_extras().items():
+            kwargs.setdefault(key, value)
+        exit_json(**kwargs)
+
+    def _fail_json(**kwargs):
+        for key, value in result_extras().items():
+            kwargs.setdefault(key, value)
+        fail_json(**kwargs)
+
+    module.exit_json = _exit_json
+    module.fail_json = _fail_json
+    module._vdirect_wrapped = True
+
+
+class _ControllerCache(object):
+    """
+    json file cache kept on the ansible controller.
+    every module run is a new process, so anything worth remembering between tasks is stored here.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = os.path.expanduser(cache_dir) if cache_dir else ""
+
+    def _entry_path(self, section, key):
+        digest = hashlib.sha1(json.dumps(key, sort_keys=True).encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, section, digest)
+
+    def get(self, section, key, max_age=None):
+        """
+        :param section:
+        :param key: any json serializable value
+        :param max_age: seconds. entries older than max_age are ignored. None means no expiry
+        :return: cached value or None
+        """
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._entry_path(section, key), 'r') as r:
+                entry = json.load(r)
+        except (IOError, OSError, ValueError):
+            return None
+        if max_age is not None and time.time() - entry.get('stored', 0) > max_age:
+            return None
+        return entry.get('value')
+
+    def set(self, section, key, value):
+        if not self.cache_dir:
+            return
+        path = self._entry_path(section, key)
+        try:
+            entry_dir = os.path.dirname(path)
+            if not os.path.isdir(entry_dir):
+                os.makedirs(entry_dir, 0o700)
+            fd, tmp_path = tempfile.mkstemp(dir=entry_dir)
+            with os.fdopen(fd, 'w') as w:
+                json.dump(dict(stored=time.time(), value=value), w)
+            # rename is atomic, concurrent readers see either the old or the new entry
+            os.rename(tmp_path, path)
+        except (IOError, OSError):
+            pass
+
+    def invalidate(self, section, key):
+        if not self.cache_dir:
+            return
+        try:
+            os.remove(self._entry_path(section, key))
+        except OSError:
+            pass
+
+    def clear(self, section):
+        if not self.cache_dir:
+            return
+        shutil.rmtree(os.path.join(self.cache_dir, section), ignore_errors=True)
+
+    def flight(self, section, key):
+        """
+        lock file of a cache entry, shared by all processes of the controller user, see _Flight.
+        does not lock anything when the cache is disabled or the platform has no fcntl
+        :param section:
+        :param key:
+        :return: context manager
+        """
+        if not self.cache_dir or not HAS_FCNTL:
+            return _Flight(None)
+        return _Flight(os.path.join(self.cache_dir, 'lock', os.path.relpath(self._entry_path(section, key),
+                                                                            self.cache_dir)))
+
+
+class _RequestLimiter(object):
+    """
+    token bucket and cap on requests in flight toward one vDirect, shared by the module processes of the
+    controller through lock files. limits are not applied when the lock files can not be used
+    """
+
+    def __init__(self, limit_dir, rate, max_in_flight):
+        """
+        :param limit_dir: directory of the lock files
+        :param rate: requests per second, 0 for no rate limit. up to one second of requests may be sent at once
+        :param max_in_flight: 0 for no cap
+        """
+        self.limit_dir = limit_dir
+        self.rate = float(rate or 0)
+        self.max_in_flight = max_in_flight or 0
+
+    def acquire(self):
+        """
+        wait for a token and a free in flight slot
+        :return: (slot to release, seconds waited)
+        """
+        start = time.time()
+        slot = None
+        try:
+            if self.rate > 0:
+                time.sleep(self._take_token())
+            if self.max_in_flight > 0:
+                slot = self._take_slot()
+        except (IOError, OSError):
+            pass
+        return slot, time.time() - start
+
+    def release(self, slot):
+        if slot is not None:
+            os.close(slot)
+
+    def _open(self, name):
+        try:
+            os.makedirs(self.limit_dir, 0o700)
+        except OSError:
+            # created by another process
+            pass
+        return os.open(os.path.join(self.limit_dir, name), os.O_RDWR | os.O_CREAT, 0o600)
+
+    def _take_token(self):
+        """
+        take a token from the bucket. when it is empty the token is taken in advance, so waiting requests
+        are served in turn
+        :return: seconds to wait for the token
+        """
+        burst = max(1.0, self.rate)
+        fd = self._open('bucket')
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            now = time.time()
+            try:
+                tokens, updated = [float(value) for value in os.read(fd, 64).split()]
+                tokens = min(burst, tokens + (now - updated) * self.rate)
+            except ValueError:
+                tokens = burst
+            tokens -= 1
+            os.lseek(fd, 0, os.SEEK_SET)
+            os.ftruncate(fd, 0)
+            os.write(fd, ("%f %f" % (tokens, now)).encode('ascii'))
+        finally:
+            os.close(fd)
+        return -tokens / self.rate if tokens < 0 else 0
+
+    def _take_slot(self):
+        """
+        lock one of the max_in_flight slot files, waiting for one to be released
+        :return: file descriptor holding the slot
+        """
+        slots = list(range(self.max_in_flight))
+        delay = 0.005
+        while True:
+            random.shuffle(slots)
+            for slot in slots:
+                fd = self._open("slot%d" % slot)
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    return fd
+                except (IOError, OSError):
+                    os.close(fd)
+            time.sleep(delay)
+            delay = min(delay * 2, 0.1)
+
+
+class _Flight(object):
+    """
+    the first process to enter holds an exclusive flock while it fetches the entry.
+    the processes entering meanwhile wait for it to be done (waited is True), and then go on together.
+    locks are released when the block ends or the process exits
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.fd = None
+        self.waited = False
+
+    def __enter__(self):
+        if self.path:
+            try:
+                try:
+                    os.makedirs(os.path.dirname(self.path), 0o700)
+                except OSError:
+                    # created by another process
+                    pass
+                self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+                try:
+                    fcntl.flock(self.fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except (IOError, OSError):
+                    fcntl.flock(self.fd, fcntl.LOCK_SH)
+                    self.waited = True
+            except (IOError, OSError):
+                # go on without the lock
+                self.__exit__()
+        return self
+
+    def __exit__(self, *args):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+if HAS_KEEPALIVE:
+
+    def _open_socket(host, port, timeout, timings):
+        """
+        socket.create_connection, timing name resolution and connection setup separately
+        :param timings: dict receiving dns and connect, in seconds
+        :return: connected socket
+        """
+        start = time.time()
+        addresses = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)
+        resolved = time.time()
+        timings['dns'] = resolved - start
+
+        error = socket.error("getaddrinfo returns an empty list")
+        for family, socktype, proto, _, address in addresses:
+            sock = socket.socket(family, socktype, proto)
+            try:
+                sock.settimeout(timeout)
+                # streamed request bodies are sent apart from the headers, don't let nagle hold them back
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                sock.connect(address)
+                timings['connect'] = time.time() - resolved
+                return sock
+            except socket.error as ex:
+                error = ex
+                sock.close()
+        raise error
+
+    class _VDirectHTTPConnection(httplib.HTTPConnection):
+        """
+        http connection recording its setup timings
+        """
+
+        def __init__(self, host, port, timeout):
+            httplib.HTTPConnection.__init__(self, host, port, timeout=timeout)
+            self.timings = {}
+
+        def connect(self):
+            self.sock = _open_socket(self.host, self.port, self.timeout, self.timings)
+
+    class _VDirectHTTPSConnection(httplib.HTTPSConnection):
+        """
+        https connection resuming a tls session negotiated earlier with the same vDirect,
+        recording its setup timings
+        """
+
+        def __init__(self, host, port, timeout, context, tls_session=None):
+            httplib.HTTPSConnection.__init__(self, host, port, timeout=timeout, context=context)
+            self.ssl_context = context
+            self.tls_session = tls_session
+            self.tls_resumed = False
+            self.timings = {}
+
+        def connect(self):
+            sock = _open_socket(self.host, self.port, self.timeout, self.timings)
+            kwargs = dict(server_hostname=self.host)
+            # tls session resumption is available from python 3.6
+            if self.tls_session is not None and hasattr(ssl.SSLSocket, 'session'):
+                kwargs['session'] = self.tls_session
+            start = time.time()
+            self.sock = self.ssl_context.wrap_socket(sock, **kwargs)
+            self.timings['tls'] = time.time() - start
+            self.tls_resumed = getattr(self.sock, 'session_reused', False)
+
+
+class _PooledResponse(object):
+    """
+    file like http response. the connection goes back to the pool once the body was read
+    """
+
+    def __init__(self, resp, release, on_done=None):
+        self.resp = resp
+        self.release = release
+        self.on_done = on_done
+        self.bytes_read = 0
+        if resp.length == 0:
+            # no body (204, 304), nothing for the caller to read
+            resp.read()
+        if resp.isclosed():
+            self._release()
+
+    def _release(self):
+        if self.release:
+            self.release(self.resp)
+            self.release = None
+        if self.on_done:
+            self.on_done(self.bytes_read)
+            self.on_done = None
+
+    def read(self, amt=None):
+        data = self.resp.read() if amt is None else self.resp.read(amt)
+        self.bytes_read += len(data)
+        if self.resp.isclosed() or not data:
+            self._release()
+        return data
+
+    def getheader(self, name, default=None):
+        return self.resp.getheader(name, default)
+
+    def close(self):
+        self.resp.close()
+        self.release = None
+
+
+class _BrokerResponse(object):
+    """
+    file like response body received from the broker, in frames
+    """
+
+    def __init__(self, sock, stream, on_done=None):
+        self.sock = sock
+        self.stream = stream
+        self.on_done = on_done
+        self.remaining = 0
+        self.bytes_read = 0
+        self.done = False
+
+    def _next_frame(self):
+        line = self.stream.readline().strip()
+        self.remaining = int(line, 16) if line else 0
+        if not self.remaining:
+            self._close()
+
+    def _close(self):
+        if not self.done:
+            self.done = True
+            self.stream.close()
+            self.sock.close()
+
+    def read(self, amt=None):
+        chunks = []
+        while not self.done and (amt is None or amt > 0):
+            if not self.remaining:
+                self._next_frame()
+                continue
+            data = self.stream.read(self.remaining if amt is None else min(amt, self.remaining))
+            if not data:
+                # broker went away
+                self._close()
+                break
+            self.remaining -= len(data)
+            if amt is not None:
+                amt -= len(data)
+            chunks.append(data)
+
+        data = b''.join(chunks)
+        self.bytes_read += len(data)
+        if self.done and self.on_done:
+            self.on_done(self.bytes_read)
+            self.on_done = None
+        return data
+
+    def close(self):
+        self._close()
+        self.on_done = None
+
+
+def _closed_by_peer(ex):
+    """
+    whether a request on a reused connection failed because vDirect had closed the connection, without answering.
+    a timeout is not such a failure - vDirect may still be processing the request
+    :param ex: exception raised while sending the request or reading the response status
+    :return: boolean
+    """
+    if isinstance(ex, socket.timeout):
+        return False
+    # RemoteDisconnected of python 3 is a BadStatusLine
+    if isinstance(ex, httplib.BadStatusLine):
+        return True
+    return getattr(ex, 'errno', None) in (errno.ECONNRESET, errno.EPIPE)
+
+
+class _ConnectionPool(object):
+    """
+    keep-alive connections to vDirect endpoints, shared by the vDirect instances of the module process.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.idle = {}
+        self.ssl_contexts = {}
+        self.tls_sessions = {}
+        self.opened = 0
+        self.reused = 0
+        self.tls_resumed = 0
+
+    def _connect(self, key, timeout):
+        scheme, host, port, validate_certs = key
+        if scheme == 'https':
+            with self.lock:
+                # a tls session can only be resumed with the context that negotiated it
+                context = self.ssl_contexts.get(key)
+                if context is None:
+                    context = self.ssl_contexts[key] = ssl.create_default_context()
+                    if not validate_certs:
+                        context.check_hostname = False
+                        context.verify_mode = ssl.CERT_NONE
+            conn = _VDirectHTTPSConnection(host, port, timeout, context, self.tls_sessions.get(key))
+        else:
+            conn = _VDirectHTTPConnection(host, port, timeout)
+        conn.connect()
+        with self.lock:
+            self.opened += 1
+            if getattr(conn, 'tls_resumed', False):
+                self.tls_resumed += 1
+        return conn
+
+    def _acquire(self, key, timeout):
+        with self.lock:
+            idle = self.idle.get(key)
+            if idle:
+                self.reused += 1
+                conn = idle.pop()
+                conn.timeout = timeout
+                if conn.sock is not None:
+                    conn.sock.settimeout(timeout)
+                return conn, True
+        return self._connect(key, timeout), False
+
+    def _release(self, key, conn, resp):
+        with self.lock:
+            # tls 1.3 session tickets arrive after the handshake, so the session is picked up here
+            session = getattr(conn.sock, 'session', None)
+            if session is not None:
+                self.tls_sessions[key] = session
+            if resp.will_close:
+                conn.close()
+            else:
+                self.idle.setdefault(key, []).append(conn)
+
+    def request(self, key, method, path, body, headers, timeout, timing=None, on_done=None):
+        """
+        send a request over an idle connection to the endpoint, opening a new one when none is available
+        :param key: (scheme, host, port, validate_certs)
+        :param timing: dict receiving the connection setup timings of a new connection and ttfb, in seconds
+        :param on_done: called with the response body size once the body was read
+        :return: http response. read it completely to give the connection back to the pool
+        """
+        timing = {} if timing is None else timing
+        conn, reused = self._acquire(key, timeout)
+        try:
+            sent = time.time()
+            conn.request(method, path, body, headers)
+            resp = conn.getresponse()
+        except (httplib.HTTPException, socket.error) as ex:
+            conn.close()
+            if not reused:
+                timing.update(conn.timings)
+                raise
+            if method not in IDEMPOTENT_METHODS or not _closed_by_peer(ex):
+                raise
+            # vDirect closed the idle connection, retry once on a new one
+            if hasattr(body, 'seek'):
+                body.seek(0)
+            conn, reused = self._connect(key, timeout), False
+            sent = time.time()
+            conn.request(method, path, body, headers)
+            resp = conn.getresponse()
+
+        timing['ttfb'] = time.time() - sent
+        timing['status'] = resp.status
+        timing['connection'] = 'reused' if reused else 'new'
+        if not reused:
+            timing.update(conn.timings)
+        return _PooledResponse(resp, lambda r: self._release(key, conn, r), on_done)
+
+
+if HAS_KEEPALIVE:
+
+    class _BrokerHandler(socketserver.StreamRequestHandler):
+        """
+        one request from a module process: a JSON header line followed by the request body.
+        the reply is a JSON header line followed by the response body in frames, "<hex size>\\n<data>",
+        ending with an empty frame
+        """
+
+        def handle(self):
+            try:
+                header = json.loads(self.rfile.readline().decode('utf-8'))
+                if 'command' in header:
+                    self._reply(self.server.command(header['command']))
+                else:
+                    self._forward(header)
+            except (ValueError, KeyError, socket.error) as ex:
+                try:
+                    self._reply(dict(error="broker request failed: %s" % ex))
+                except socket.error:
+                    pass
+
+        def _reply(self, header):
+            self.wfile.write((json.dumps(header) + '\n').encode('utf-8'))
+
+        def _forward(self, header):
+            parsed = urlparse.urlparse(header['url'])
+            path = parsed.path
+            if parsed.query:
+                path = "%s?%s" % (path, parsed.query)
+            key = (parsed.scheme, parsed.hostname, parsed.port, bool(header['validate_certs']))
+
+            body = None
+            if header.get('length'):
+                # spooled, so the pool can send it again on a new connection
+                body = tempfile.SpooledTemporaryFile(max_size=BROKER_SPOOL_SIZE)
+                remaining = header['length']
+                while remaining:
+                    chunk = self.rfile.read(min(remaining, CHUNK_SIZE))
+                    if not chunk:
+                        raise socket.error("request body truncated")
+                    body.write(chunk)
+                    remaining -= len(chunk)
+                body.seek(0)
+
+            server = self.server
+            with server.lock:
+                server.requests += 1
+                server.active += 1
+            try:
+                self._send(server, key, header, path, body)
+            finally:
+                with server.lock:
+                    server.active -= 1
+                    server.last_activity = time.time()
+
+        def _send(self, server, key, header, path, body):
+            timing = {}
+            try:
+                resp = server.pool.request(key, header['method'], path, body, header['headers'],
+                                           header['timeout'], timing)
+            except (httplib.HTTPException, socket.error, ssl.SSLError, ssl.CertificateError) as ex:
+                self._reply(dict(error="Request failed: %s" % ex, timing=timing))
+                return
+            finally:
+                if body is not None:
+                    body.close()
+
+            self._reply(dict(status=resp.resp.status, reason=resp.resp.reason, headers=resp.resp.getheaders(),
+                             timing=timing))
+            data = resp.read(CHUNK_SIZE)
+            while data:
+                self.wfile.write(("%x\n" % len(data)).encode('ascii') + data)
+                data = resp.read(CHUNK_SIZE)
+            self.wfile.write(b"0\n")
+
+    class _BrokerServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        """
+        keep-alive connections to vDirect shared by the module processes of the controller
+        """
+
+        daemon_threads = True
+        # batch operations of every module process connect at once
+        request_queue_size = 128
+
+        def __init__(self, socket_path, idle_timeout):
+            # the socket is created accessible to its owner only, requests sent through it carry credentials
+            umask = os.umask(0o077)
+            try:
+                socketserver.UnixStreamServer.__init__(self, socket_path, _BrokerHandler)
+            finally:
+                os.umask(umask)
+            self.pool = _ConnectionPool()
+            self.lock = threading.Lock()
+            self.idle_timeout = idle_timeout
+            self.started = self.last_activity = time.time()
+            self.requests = 0
+            self.active = 0
+            self.stopping = False
+
+        def command(self, command):
+            if command == 'stop':
+                self.stopping = True
+            elif command != 'status':
+                return dict(error="unknown broker command %s" % command)
+            return dict(pid=os.getpid(), uptime=round(time.time() - self.started, 1), requests=self.requests,
+                        active=self.active, idle_timeout=self.idle_timeout, opened=self.pool.opened,
+                        reused=self.pool.reused, tls_resumed=self.pool.tls_resumed, stopping=self.stopping)
+
+        def idle(self):
+            with self.lock:
+                return not self.active and time.time() - self.last_activity > self.idle_timeout
+
+
+def broker_command(socket_path, command, timeout=5):
+    """
+    send a command to the broker listening on socket_path
+    :param socket_path:
+    :param command: status|stop
+    :param timeout:
+    :return: reply dict, None when no broker listens on socket_path
+    """
+    socket_path = os.path.expanduser(socket_path)
+    if not os.path.exists(socket_path):
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.settimeout(timeout)
+        sock.connect(socket_path)
+        sock.sendall((json.dumps(dict(command=command)) + '\n').encode('utf-8'))
+        return json.loads(sock.makefile('rb').readline().decode('utf-8'))
+    except (socket.error, ValueError):
+        return None
+    finally:
+        sock.close()
+
+
+def run_broker(socket_path, idle_timeout):
+    """
+    serve module processes on socket_path until stopped, or idle for idle_timeout seconds
+    :param socket_path:
+    :param idle_timeout:
+    """
+    socket_path = os.path.expanduser(socket_path)
+    if broker_command(socket_path, 'status') is not None:
+        # another broker serves this socket
+        return
+    socket_dir = os.path.dirname(socket_path)
+    if socket_dir and not os.path.isdir(socket_dir):
+        os.makedirs(socket_dir, 0o700)
+    if os.path.exists(socket_path):
+        # left behind by a broker that did not shut down
+        os.unlink(socket_path)
+
+    server = _BrokerServer(socket_path, idle_timeout)
+    serving = threading.Thread(target=server.serve_forever, kwargs=dict(poll_interval=0.5))
+    serving.daemon = True
+    serving.start()
+    try:
+        while not server.stopping and not server.idle():
+            time.sleep(0.5)
+    finally:
+        server.shutdown()
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+def start_broker(socket_path, idle_timeout, wait=5):
+    """
+    start a broker daemon, detached from the module process
+    :param socket_path:
+    :param idle_timeout:
+    :param wait: seconds to wait for the broker to listen
+    :return: broker status, None when it did not start
+    """
+    pid = os.fork()
+    if pid == 0:
+        # daemon: new session, no inherited descriptors, so ansible does not wait for it
+        try:
+            os.setsid()
+            os.chdir('/')
+            if os.fork():
+                os._exit(0)
+            devnull = os.open(os.devnull, os.O_RDWR)
+            for fd in (0, 1, 2):
+                os.dup2(devnull, fd)
+            os.closerange(3, 1024)
+            run_broker(socket_path, idle_timeout)
+        finally:
+            os._exit(0)
+
+    os.waitpid(pid, 0)
+    deadline = time.time() + wait
+    while time.time() < deadline:
+        status = broker_command(socket_path, 'status')
+        if status is not None:
+            return status
+        time.sleep(0.1)
+    return None
+
+
 class vDirect(object):
 
     vdirect_version = ""
@@ -82,6 +927,21 @@ class vDirect(object):
 
     primary_found = False
 
+    connection_pool = _ConnectionPool() if HAS_KEEPALIVE else None
+
+    # parameter definitions fetched by this module process, and the argument specs compiled from them
+    definitions = {}
+    argument_specs = {}
+
+    # session cookies of this module process, see _get_session
+    sessions = {}
+
+    # False once the broker could not be reached by this module process
+    broker_available = None
+
+    # serializes trace_file writes of worker threads
+    trace_lock = threading.Lock() if HAS_LIBS else None
+
     class RequestMethods(object):
         get = 'GET'
         GET = 'GET'
@@ -98,17 +958,141 @@ class vDirect(object):
     def __init__(self, module):
 
         self.module = module
-        self.vdirect_ip, self.secondary_vdirect_ip, self.username, self.password, self.port, self.scheme, self.timeout,\
-            self.validate_certs, self.device_type, self.device_name, self.show_help = vdirect_parse_arguments(module)
+
+        if not HAS_LIBS:
+            module.fail_json(msg="required python libraries (copy|hashlib|inspect|json|os|random|shutil|struct|"
+                                 "tempfile|threading|Queue|urlparse|ZipFile|expat|expatError|time) missing")
+
+        self.vdirect_ip, self.secondary_vdirect_ip, self.username, self.password, self.port, self.scheme, \
+            self.timeout, self.validate_certs, self.device_type, self.device_name, self.show_help, cache_dir, \
+            self.cache_ttl, keepalive, self.trace_file, broker_socket, self.session_ttl, self.probe_timeout, \
+            self.coalesce, rate_limit, max_in_flight = vdirect_parse_arguments(module)
+
+        self.keepalive = keepalive and HAS_KEEPALIVE
+        self.broker_socket = os.path.expanduser(broker_socket) if broker_socket and HAS_KEEPALIVE else ""
 
         self.device_parameter_name = ""
+        # (bytes, seconds) of every file upload
+        self.uploads = []
+        # one record per request, see _start_timing
+        self.timings = []
+        # outcome of probing the HA pair, see _get_primary_vdirect
+        self.ha_probe = None
+        # seconds waited for every result shared by another module process, see _coalesced
+        self.coalesced = []
+
+        self.cache = _ControllerCache(cache_dir)
+        # HA pair as configured by the user, before any primary/secondary swap
+        self.endpoint_key = [self.vdirect_ip, self.secondary_vdirect_ip, self.port, self.scheme]
+        self.endpoint_cached = False
+
+        self.limiter = None
+        if (rate_limit or max_in_flight) and self.cache.cache_dir and HAS_FCNTL:
+            self.limiter = _RequestLimiter(self.cache._entry_path('limit', self.endpoint_key), rate_limit,
+                                           max_in_flight)
+
+        if not self._load_endpoint():
+            wait_start = time.time()
+            with self._coalesced('endpoint', self.endpoint_key) as flight:
+                # another module process probed the HA pair while this one waited
+                if flight.waited and self._load_endpoint():
+                    self.coalesced.append(time.time() - wait_start)
+                else:
+                    self._get_primary_vdirect()
+                    self._check_version()
+                    self._store_endpoint()
 
-        self._get_primary_vdirect()
+    @property
+    def module(self):
+        return self._module
 
-        self._check_version()
+    @module.setter
+    def module(self, module):
+        self._module = module
+        _wrap_module_results(module, self._result_extras)
 
-        if not HAS_LIBS:
-            module.fail_json(msg="required python libraries (inspect|json|ZipFile|minidom|expatError|time) missing")
+    def _result_extras(self):
+        """
+        client side information added to the module result
+        :return: dict
+        """
+        extras = {}
+        if getattr(self, 'keepalive', False):
+            pool = vDirect.connection_pool
+            extras['connections'] = dict(opened=pool.opened, reused=pool.reused, tls_resumed=pool.tls_resumed)
+        if getattr(self, 'uploads', None):
+            size = sum(upload[0] for upload in self.uploads)
+            seconds = sum(upload[1] for upload in self.uploads)
+            extras['upload'] = dict(bytes=size, seconds=round(seconds, 3),
+                                    throughput=int(size / seconds) if seconds else size)
+        if getattr(self, 'ha_probe', None):
+            extras['ha'] = self.ha_probe
+        if getattr(self, 'limiter', None):
+            queued = [timing['queued'] for timing in self.timings if 'queued' in timing]
+            extras['queued'] = dict(requests=len(queued), seconds=round(sum(queued), 3),
+                                    max=round(max(queued or [0]), 3))
+        if getattr(self, 'coalesce', False):
+            extras['coalesced'] = dict(shared=len(self.coalesced), waited=round(sum(self.coalesced), 3))
+        brokered = [timing for timing in getattr(self, 'timings', []) if timing.get('broker')]
+        if brokered:
+            extras['broker'] = dict(socket=self.broker_socket, requests=len(brokered),
+                                    reused=len([timing for timing in brokered if timing.get('connection') == 'reused']))
+        if getattr(self, 'timings', None):
+            calls = [_round_timing(timing) for timing in self.timings]
+            extras['timings'] = dict(requests=len(calls),
+                                     seconds=round(sum(call.get('total', 0) for call in calls), 4),
+                                     bytes_out=sum(call['bytes_out'] for call in calls),
+                                     bytes_in=sum(call.get('bytes_in', 0) for call in calls),
+                                     calls=calls)
+        return extras
+
+    def _coalesced(self, section, key):
+        """
+        with coalesce, among module processes fetching the same cache entry at the same time, the first one fetches
+        it and the others wait for it, and then look for the entry in the cache
+        :param section:
+        :param key:
+        :return: context manager, see _Flight
+        """
+        if not self.coalesce:
+            return _Flight(None)
+        return self.cache.flight(section, key)
+
+    def _load_endpoint(self):
+        """
+        use the active vDirect and version found by a previous module run
+        :return: boolean
+        """
+        if (vDirect.primary_found and vDirect.vdirect_version) or not self.cache_ttl:
+            return False
+
+        endpoint = self.cache.get('endpoint', self.endpoint_key, self.cache_ttl)
+        if not endpoint:
+            return False
+
+        self.vdirect_ip, self.secondary_vdirect_ip = endpoint['active'], endpoint['standby']
+        vDirect.vdirect_version = endpoint['version']
+        vDirect.primary_found = True
+        self.endpoint_cached = True
+        return True
+
+    def _store_endpoint(self):
+
+        if self.cache_ttl:
+            self.cache.set('endpoint', self.endpoint_key, dict(active=self.vdirect_ip,
+                                                               standby=self.secondary_vdirect_ip,
+                                                               version=vDirect.vdirect_version))
+
+    def _rediscover_endpoint(self):
+        """
+        drop the cached active vDirect after a failure and probe the HA pair again
+        """
+        self.cache.invalidate('endpoint', self.endpoint_key)
+        self.endpoint_cached = False
+        self.vdirect_ip, self.secondary_vdirect_ip = self.endpoint_key[0], self.endpoint_key[1]
+        vDirect.primary_found = False
+        self._get_primary_vdirect()
+        self._store_endpoint()
 
     def _get_primary_vdirect(self):
 
@@ -120,21 +1104,60 @@ class vDirect(object):
                 500: "Error 500 connecting to vDirect"
             }
 
-            url = "api/ha/active"
-            resp, info = self._http_get_request(url, handle_errors=False, skip_auth=True)
-            status_code = info.get('status')
-            if status_code != 204:
-                if self.secondary_vdirect_ip != "":
-                    self.vdirect_ip, self.secondary_vdirect_ip = self.secondary_vdirect_ip, self.vdirect_ip
-                    resp, info = self._http_get_request(url, handle_errors=False, skip_auth=True)
-                    status_code = info.get('status')
-                    if status_code != 204:
-                        self.module.fail_json(msg="Failed to contact vdirect server")
-                else:
-                    self.module.fail_json(msg=error_status.get(status_code))
-
+            members = [self.vdirect_ip]
+            if self.secondary_vdirect_ip != "":
+                members.append(self.secondary_vdirect_ip)
+
+            # both members are probed at once, the first to answer 204 is active.
+            # a member that does not answer is not waited for longer than probe_timeout
+            start = time.time()
+            answers = queue.Queue()
+            for member in members:
+                probe = threading.Thread(target=lambda ip=member: answers.put(self._probe(ip)))
+                probe.daemon = True
+                probe.start()
+
+            probes = []
+            while len(probes) < len(members):
+                try:
+                    probes.append(answers.get(timeout=self.probe_timeout + 1))
+                except queue.Empty:
+                    break
+                if probes[-1]['status'] == 204:
+                    break
+            for member in members:
+                if member not in [probe['ip'] for probe in probes]:
+                    probes.append(dict(ip=member, status=None, seconds=None))
+            self.ha_probe = dict(probes=probes, seconds=round(time.time() - start, 3))
+
+            active = [probe['ip'] for probe in probes if probe['status'] == 204]
+            if not active:
+                if len(members) > 1:
+                    self.module.fail_json(msg="Failed to contact vdirect server")
+                self.module.fail_json(msg=error_status.get(probes[0]['status']))
+
+            if active[0] != self.vdirect_ip:
+                self.vdirect_ip, self.secondary_vdirect_ip = self.secondary_vdirect_ip, self.vdirect_ip
+            self.ha_probe['active'] = self.vdirect_ip
             vDirect.primary_found = True
 
+    def _probe(self, vdirect_ip):
+        """
+        ask a member of the HA pair whether it is the active vDirect, within probe_timeout
+        :param vdirect_ip:
+        :return: dict(ip, status, seconds). status is -1 when the member could not be reached
+        """
+        probe = self.worker()
+        probe.vdirect_ip = vdirect_ip
+        probe.timeout = self.probe_timeout
+        start = time.time()
+        try:
+            resp, info = probe._http_get_request("api/ha/active", handle_errors=False, skip_auth=True)
+            status = info.get('status')
+        except vDirectError:
+            status = -1
+        return dict(ip=vdirect_ip, status=status, seconds=round(time.time() - start, 3))
+
     def _check_version(self):
 
         if not vDirect.vdirect_version:
@@ -171,26 +1194,237 @@ class vDirect(object):
         self.module.params.pop('url_username', None)
         self.module.params.pop('url_password', None)
 
+    def _session_key(self, actual_url):
+        """
+        sessions belong to a vDirect server and a user. the password is part of the key, so a changed password
+        starts a new session, but only as a digest
+        """
+        parsed = urlparse.urlparse(actual_url)
+        password = hashlib.sha256(("%s" % self.password).encode('utf-8')).hexdigest()
+        return [parsed.scheme, parsed.netloc, self.username, password]
+
+    def _get_session(self, actual_url):
+        """
+        session cookie obtained by this or a previous module run
+        :return: cookie header value, None when basic authentication is needed
+        """
+        if not self.session_ttl:
+            return None
+        key = self._session_key(actual_url)
+        session = vDirect.sessions.get(tuple(key))
+        if session is None:
+            session = self.cache.get('session', key, self.session_ttl)
+            if session is not None:
+                vDirect.sessions[tuple(key)] = session
+        return session
+
+    def _store_session(self, actual_url, info, session):
+        """
+        keep the session cookie vDirect set on the response
+        :param info: response info
+        :param session: cookie sent with the request, None for basic authentication
+        """
+        cookie = _session_cookie(info.get('set-cookie'))
+        if not self.session_ttl or cookie is None or cookie == session:
+            return
+        key = self._session_key(actual_url)
+        vDirect.sessions[tuple(key)] = cookie
+        # cache entries are only readable by the controller user
+        self.cache.set('session', key, cookie)
+
+    def _drop_session(self, actual_url):
+        key = self._session_key(actual_url)
+        vDirect.sessions.pop(tuple(key), None)
+        self.cache.invalidate('session', key)
+
+    def _request_headers(self, request_properties, skip_auth):
+        """
+        headers of a keep-alive or brokered request
+        """
+        headers = dict(request_properties or {})
+        if not skip_auth:
+            credentials = ("%s:%s" % (self.username, self.password)).encode('utf-8')
+            headers['Authorization'] = "Basic %s" % base64.b64encode(credentials).decode('ascii')
+        return headers
+
+    def _broker_request(self, actual_url, request_method, data, request_properties, skip_auth, timing):
+        """
+        send the request through the broker, see vdirect_broker
+        :return: (resp, info) as returned by fetch_url, None when the broker can not be reached
+        """
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.settimeout(self.timeout)
+            sock.connect(self.broker_socket)
+        except socket.error:
+            sock.close()
+            vDirect.broker_available = False
+            return None
+
+        if data is not None and not hasattr(data, 'read') and not isinstance(data, bytes):
+            data = data.encode('utf-8')
+        length = _stream_size(data) if hasattr(data, 'read') else len(data or b'')
+        header = dict(method=request_method, url=actual_url,
+                      headers=self._request_headers(request_properties, skip_auth),
+                      validate_certs=bool(self.validate_certs), timeout=self.timeout, length=length)
+
+        info = dict(url=actual_url)
+        timing['broker'] = True
+        try:
+            sock.sendall((json.dumps(header) + '\n').encode('utf-8'))
+            if hasattr(data, 'read'):
+                chunk = data.read(CHUNK_SIZE)
+                while chunk:
+                    sock.sendall(chunk)
+                    chunk = data.read(CHUNK_SIZE)
+            elif data:
+                sock.sendall(data)
+            stream = sock.makefile('rb')
+            reply = json.loads(stream.readline().decode('utf-8'))
+        except (socket.error, ValueError) as ex:
+            sock.close()
+            info.update(dict(msg="Broker request failed: %s" % ex, status=-1))
+            return None, info
+
+        timing.update(reply.get('timing', {}))
+        if 'error' in reply:
+            sock.close()
+            info.update(dict(msg=reply['error'], status=-1))
+            return None, info
+
+        resp = _BrokerResponse(sock, stream, lambda size: self._finish_timing(timing, size))
+        info.update(dict((name.lower(), value) for name, value in reply['headers']))
+        info['status'] = reply['status']
+        if reply['status'] >= 400:
+            info.update(dict(msg="HTTP Error %d: %s" % (reply['status'], reply['reason']), body=resp.read()))
+            return None, info
+
+        info['msg'] = "OK (%s bytes)" % info.get('content-length', 'unknown')
+        return resp, info
+
+    def _pooled_request(self, actual_url, request_method, data, request_properties, skip_auth, timing):
+        """
+        keep-alive replacement for fetch_url, returning the same (resp, info) pair
+        """
+        parsed = urlparse.urlparse(actual_url)
+        path = parsed.path
+        if parsed.query:
+            path = "%s?%s" % (path, parsed.query)
+
+        headers = self._request_headers(request_properties, skip_auth)
+
+        key = (parsed.scheme, parsed.hostname, parsed.port, bool(self.validate_certs))
+        info = dict(url=actual_url)
+        try:
+            resp = vDirect.connection_pool.request(key, request_method, path, data, headers, self.timeout, timing,
+                                                   lambda size: self._finish_timing(timing, size))
+        except (httplib.HTTPException, socket.error, ssl.SSLError, ssl.CertificateError) as ex:
+            info.update(dict(msg="Request failed: %s" % ex, status=-1))
+            return None, info
+
+        info.update(dict((name.lower(), value) for name, value in resp.resp.getheaders()))
+        info['status'] = resp.resp.status
+        if resp.resp.status >= 400:
+            info.update(dict(msg="HTTP Error %d: %s" % (resp.resp.status, resp.resp.reason), body=resp.read()))
+            return None, info
+
+        info['msg'] = "OK (%s bytes)" % info.get('content-length', 'unknown')
+        return resp, info
+
     def _make_http_request(self, url, request_method=RequestMethods.get, data=None,
                            request_properties=None, handle_errors=True,
                            response_is_json=True, skip_auth=False,
                            url_is_actual=False):
 
-        if skip_auth:
-            self._rem_auth_headers()
-        else:
-            if not self.module.params.get('force_basic_auth', False):
-                self._add_auth_headers()
-
         if url_is_actual:
             actual_url = url
         else:
             actual_url = "%s://%s:%s/%s" % (self.scheme, self.vdirect_ip, self.port, url)
 
-        resp, info = fetch_url(self.module, actual_url, headers=request_properties, method=request_method, data=data,
-                               timeout=self.timeout, force=True)
+        upload_size = None
+        if hasattr(data, 'read'):
+            # file upload, streamed from disk
+            upload_size = _stream_size(data)
+            request_properties = dict(request_properties or {})
+            request_properties['Content-Length'] = str(upload_size)
+        # retries send the caller's headers, without the session cookie
+        caller_properties = request_properties
+        session = None if skip_auth else self._get_session(actual_url)
+        if session is not None:
+            # authenticated by the session cookie, vDirect does not need to verify the credentials again
+            request_properties = dict(request_properties or {})
+            request_properties['Cookie'] = session
+        send_credentials = not skip_auth and session is None
+
+        # waiting for the rate limit and a free in flight slot is not part of the request timing
+        slot, queued = self.limiter.acquire() if self.limiter else (None, 0)
+        timing = self._start_timing(request_method, actual_url, upload_size if upload_size is not None
+                                    else len(data or ''))
+        if not skip_auth:
+            timing['auth'] = 'basic' if send_credentials else 'session'
+        if self.limiter:
+            timing['queued'] = queued
+        start = timing['start']
+
+        # fetch_url sends the requests a proxy applies to, the broker and the connection pool connect directly
+        direct = not _proxied(actual_url)
+        try:
+            brokered = None
+            use_broker = direct and self.broker_socket and vDirect.broker_available is not False
+            if use_broker and os.path.exists(self.broker_socket):
+                brokered = self._broker_request(actual_url, request_method, data, request_properties,
+                                                not send_credentials, timing)
+
+            if brokered is not None:
+                resp, info = brokered
+            elif direct and self.keepalive:
+                resp, info = self._pooled_request(actual_url, request_method, data, request_properties,
+                                                  not send_credentials, timing)
+            else:
+                if not send_credentials:
+                    self._rem_auth_headers()
+                else:
+                    if not self.module.params.get('force_basic_auth', False):
+                        self._add_auth_headers()
+
+                # fetch_url can not stream request bodies
+                resp, info = fetch_url(self.module, actual_url, headers=request_properties, method=request_method,
+                                       data=data.read() if upload_size is not None else data, timeout=self.timeout,
+                                       force=True)
+                timing['ttfb'] = time.time() - start
+        finally:
+            if self.limiter:
+                self.limiter.release(slot)
 
         status_code = info['status']
+        timing['status'] = status_code
+        if resp is None or (brokered is None and not (direct and self.keepalive)):
+            # pooled and brokered responses complete their timing once the body was read
+            self._finish_timing(timing, int(info.get('content-length') or len(info.get('body') or '')))
+
+        if upload_size is not None and status_code != -1:
+            self.uploads.append((upload_size, time.time() - start))
+
+        if session is not None and status_code == 401:
+            # the session expired, renew it with the credentials
+            self._drop_session(actual_url)
+            return self._make_http_request(url, request_method=request_method, data=data,
+                                           request_properties=caller_properties, handle_errors=handle_errors,
+                                           response_is_json=response_is_json, skip_auth=skip_auth,
+                                           url_is_actual=url_is_actual)
+        if not skip_auth and status_code != -1:
+            self._store_session(actual_url, info, session)
+
+        # connection failure, unavailable service or an unexpected 404 may mean the HA pair switched roles.
+        # the request is only sent again when that can not repeat an operation vDirect already performed
+        if status_code in (-1, 503) or (status_code == 404 and handle_errors):
+            replay = request_method == self.RequestMethods.get or _connection_refused(info)
+            if self.endpoint_cached and not url_is_actual and replay:
+                self._rediscover_endpoint()
+                return self._make_http_request(url, request_method=request_method, data=data,
+                                               request_properties=caller_properties, handle_errors=handle_errors,
+                                               response_is_json=response_is_json, skip_auth=skip_auth)
+            self.cache.invalidate('endpoint', self.endpoint_key)
 
         if handle_errors and status_code != 200:
             try:
@@ -209,6 +1443,36 @@ class vDirect(object):
             resp = _format_rest_response(resp)
         return resp, info
 
+    def _start_timing(self, request_method, url, bytes_out):
+        """
+        start the timing record of a request. the record is completed by _finish_timing
+        :param request_method:
+        :param url: actual url
+        :param bytes_out: request body size
+        :return: dict
+        """
+        timing = dict(method=request_method, url=_url_template(url), status=None, bytes_out=bytes_out,
+                      start=time.time())
+        self.timings.append(timing)
+        return timing
+
+    def _finish_timing(self, timing, bytes_in):
+        """
+        complete a timing record once the response was read, and append it to trace_file
+        :param timing: record returned by _start_timing
+        :param bytes_in: response body size
+        """
+        if 'total' in timing:
+            return
+        timing['bytes_in'] = bytes_in
+        timing['total'] = time.time() - timing['start']
+
+        if self.trace_file:
+            record = dict(timing, vdirect_ip=self.vdirect_ip, pid=os.getpid())
+            with vDirect.trace_lock:
+                with open(os.path.expanduser(self.trace_file), 'a') as trace:
+                    trace.write(json.dumps(record, sort_keys=True) + '\n')
+
     def _http_get_request(self, url, request_properties=None, handle_errors=True,
                           response_is_json=True, skip_auth=False,
                           url_is_actual=False):
@@ -218,14 +1482,14 @@ class vDirect(object):
                                        response_is_json=response_is_json, skip_auth=skip_auth,
                                        url_is_actual=url_is_actual)
 
-    def _http_get_request_simple(self, url):
+    def _http_get_request_simple(self, url, with_revision=False):
         resp, info = self._http_get_request(url, handle_errors=False)
 
         if 'status' in info:
             if info.get('status') == 404:
-                return False
+                return (False, None) if with_revision else False
             elif info.get('status') == 200:
-                return True
+                return (True, _revision(info)) if with_revision else True
             else:
                 self._unknown_detailed_fail(info)
         else:
@@ -275,6 +1539,28 @@ class vDirect(object):
                 self.module.fail_json(msg="http request handling failed", info=info, resp=resp)
         self.module.fail_json(msg="http request handling failed", info=info, resp=resp)
 
+    def worker(self):
+        """
+        copy of this instance safe to use from a worker thread. failures raise vDirectError
+        :return: vDirect
+        """
+        worker = copy.copy(self)
+        worker.module = _WorkerModule(self.module)
+        return worker
+
+    def for_device(self, device_name, device_type=None):
+        """
+        worker copy of this instance managing another device
+        :param device_name:
+        :param device_type: defaults to the device_type of this instance
+        :return: vDirect
+        """
+        worker = self.worker()
+        worker.device_name = device_name
+        if device_type:
+            worker.device_type = device_type
+        return worker
+
     def get_arg_subset(self, *args):
         """
         get a subset of module parameters
@@ -290,58 +1576,166 @@ class vDirect(object):
             return parsed_args[0]
         return parsed_args
 
-    def read_file(self, file_name, binary=False):
+    def open_file(self, file_name):
         """
-        read file from disk on ansible controller executing module
-        used for uploading template/workflow source to vDirect
+        open file on ansible controller executing module for upload to vDirect.
+        the upload is streamed from the file, it is never read into memory as a whole
         :param file_name:
-        :param binary:
-        :return:
+        :return: file object
         """
         try:
-            if binary:
-                with open(file_name, 'rb') as r:
-                    content = r.read()
-                archive_name = self._get_workflow_name(file_name)
-                return archive_name, content
-            else:
-                content = open(file_name, 'r').read()
-                return content
+            return open(file_name, 'rb')
         except IOError as ioex:
             self.module.fail_json(msg="error reading file", resp=ioex.strerror)
 
-    def _get_workflow_name(self, archive_file):
+    def file_digest(self, file_name):
+        """
+        sha256 of a file on the ansible controller, read in chunks
+        :param file_name:
+        :return: hex digest
+        """
+        digest = hashlib.sha256()
+        with self.open_file(file_name) as r:
+            _update_digest(digest, r)
+        return digest.hexdigest()
+
+    def archive_digest(self, archive_file):
+        """
+        sha256 of the members of a zip archive - their names and content, but not their timestamps or compression,
+        so an archive zipped again from the same files has the same digest
+        :param archive_file: path or file object
+        :return: hex digest
+        """
+        members = []
         try:
             archive = zipfile.ZipFile(archive_file)
-            if 'workflow.xml' not in archive.namelist():
-                self.module.fail_json(msg="archive file '%s' not valid. must contain workflow.xml file" % archive_file)
-            else:
-                workflow_xml = archive.read('workflow.xml')
-                xmldom = minidom.parseString(workflow_xml)
-                workflow_name = xmldom.getElementsByTagName('workflow')[0].attributes['name'].value
-                workflow_name = workflow_name.encode('ascii', 'ignore')
+            try:
+                for name in sorted(archive.namelist()):
+                    if name.endswith('/'):
+                        continue
+                    member = hashlib.sha256()
+                    stream = archive.open(name)
+                    try:
+                        _update_digest(member, stream)
+                    finally:
+                        stream.close()
+                    members.append((name, member.hexdigest()))
+            finally:
+                archive.close()
+        except zipfile.BadZipfile:
+            self.module.fail_json(msg="archive file '%s' is not a valid zip file" % archive_file)
+        return _members_digest(members)
+
+    def build_workflow_archive(self, source_dir):
+        """
+        zip the files of a workflow source directory the same way every time - entries sorted by path,
+        with fixed timestamps and permissions. files and directories starting with '.' are left out
+        :param source_dir: directory holding workflow.xml
+        :return: (archive file object, digest of its members, as returned by archive_digest)
+        """
+        source_dir = os.path.expanduser(source_dir)
+        if not os.path.isfile(os.path.join(source_dir, 'workflow.xml')):
+            self.module.fail_json(msg="workflow directory '%s' must contain a workflow.xml file" % source_dir)
+
+        paths = []
+        for root, dirs, files in os.walk(source_dir):
+            dirs[:] = [name for name in dirs if not name.startswith('.')]
+            paths.extend(os.path.relpath(os.path.join(root, name), source_dir).replace(os.sep, '/')
+                         for name in files if not name.startswith('.'))
+
+        archive_data = tempfile.SpooledTemporaryFile(max_size=ARCHIVE_SPOOL_SIZE)
+        members = []
+        try:
+            archive = zipfile.ZipFile(archive_data, 'w', zipfile.ZIP_DEFLATED)
+            for path in sorted(paths):
+                members.append((path, _archive_file(archive, os.path.join(source_dir, path), path)))
+            archive.close()
+            _fix_archive_times(archive_data, archive.infolist())
+        except IOError as ioex:
+            self.module.fail_json(msg="error reading file", resp=ioex.strerror)
+
+        archive_data.seek(0)
+        return archive_data, _members_digest(members)
+
+    def get_workflow_metadata(self, archive_file):
+        """
+        metadata declared by workflow.xml of a workflow archive
+        :param archive_file: workflow archive, or workflow source directory
+        :return: dict - name, createAction, deleteAction, parameters (persisted parameters, name and type)
+                 and actions (name, visible and inputs)
+        """
+        return self._read_workflow_xml(archive_file)
+
+    def _read_workflow_xml(self, archive_file):
+        """
+        stream workflow.xml out of the archive through expat, without building a DOM.
+        parsing stops after the actions, so large embedded scripts are never held in memory
+        """
+        if not hasattr(archive_file, 'read') and os.path.isdir(archive_file):
+            return self._read_workflow_dir_xml(archive_file)
+        try:
+            archive = zipfile.ZipFile(archive_file)
+            try:
+                if 'workflow.xml' not in archive.namelist():
+                    self.module.fail_json(msg="archive file '%s' not valid. must contain workflow.xml file"
+                                              % archive_file)
+                reader = _WorkflowXmlReader()
+                stream = archive.open('workflow.xml')
+                try:
+                    reader.parse(stream)
+                finally:
+                    stream.close()
+            finally:
                 archive.close()
-                return workflow_name
         except zipfile.BadZipfile:
             self.module.fail_json(msg="archive file '%s' is not a valid zip file" % archive_file)
         except ExpatError:
             self.module.fail_json(msg="workflow.xml parsing failed")
-        except (IndexError, KeyError):
+
+        if not reader.metadata.get('name'):
+            self.module.fail_json(msg="workflow.xml must contain name attribute")
+        return reader.metadata
+
+    def _read_workflow_dir_xml(self, workflow_dir):
+        """
+        stream workflow.xml of a workflow source directory, like _read_workflow_xml does for an archive
+        """
+        path = os.path.join(workflow_dir, 'workflow.xml')
+        if not os.path.isfile(path):
+            self.module.fail_json(msg="workflow directory '%s' not valid. must contain workflow.xml file"
+                                      % workflow_dir)
+        reader = _WorkflowXmlReader()
+        try:
+            with open(path, 'rb') as stream:
+                reader.parse(stream)
+        except ExpatError:
+            self.module.fail_json(msg="workflow.xml parsing failed")
+
+        if not reader.metadata.get('name'):
             self.module.fail_json(msg="workflow.xml must contain name attribute")
+        return reader.metadata
 
     # workflow template methods
-    def find_workflow_template(self, workflow_template_name):
+    def list_workflow_templates(self):
+        """
+        names of the workflow templates on vDirect, in a single request
+        :return: set
+        """
+        return self._list_names("api/workflowTemplate")
+
+    def find_workflow_template(self, workflow_template_name, with_revision=False):
         """
         :param workflow_template_name:
-        :return: boolean
+        :param with_revision: also return the revision (ETag or Last-Modified) vDirect reports, None if it does not
+        :return: boolean, or (boolean, revision)
         """
         url = "api/workflowTemplate/%s" % workflow_template_name
-        return self._http_get_request_simple(url)
+        return self._http_get_request_simple(url, with_revision)
 
     def upload_workflow_template(self, workflow_archive_data):
         """
         create new workflow template
-        :param workflow_archive_data:
+        :param workflow_archive_data: archive content or file object
         :return:
         """
         url = "api/workflowTemplate?failIfInvalid=true"
@@ -350,13 +1744,14 @@ class vDirect(object):
         }
         resp, info = self._http_post_request(url, workflow_archive_data, props, False)
 
+        self.invalidate_definitions()
         return self._handle_template_response(info, resp)
 
     def update_workflow_template(self, workflow_template_name, workflow_archive_data):
         """
         update workflow template source
         :param workflow_template_name:
-        :param workflow_archive_data:
+        :param workflow_archive_data: archive content or file object
         :return:
         """
         url = "api/workflowTemplate/%s/archive?failIfInvalid=true" % workflow_template_name
@@ -367,17 +1762,16 @@ class vDirect(object):
 
         resp, info = self._http_put_request(url, workflow_archive_data, props, False)
 
+        self.invalidate_definitions()
         return self._handle_template_response(info, resp)
 
     # workflow methods
 
-    def delete_workflow(self, workflow_name, sync, async_delay):
+    def submit_delete_workflow(self, workflow_name):
         """
-        run the delete action of the workflow
+        start the delete action of the workflow
         :param workflow_name:
-        :param sync:
-        :param async_delay:
-        :return:
+        :return: response of the async operation
         """
         url = "api/workflow/%s" % workflow_name
         resp, info = self._http_delete_request(url)
@@ -386,9 +1780,7 @@ class vDirect(object):
             if info.get('status') == 404:
                 self.module.fail_json(msg="workflow (%s) not found. delete failed" % workflow_name)
             elif info.get('status') == 202:
-                if not sync:
-                    return False
-                return self.async_execute(async_delay, resp)
+                return resp
 
             else:
                 self._unknown_detailed_fail(info)
@@ -406,25 +1798,319 @@ class vDirect(object):
                 json_body = json_body.get('message')
         self.module.fail_json(msg="%s [%d]" % (info['msg'], info['status']), err_body=json_body)
 
-    def async_execute(self, async_delay, resp):
-        complete = resp.get('complete')
-        uri = resp.get('uri')
-        count = 0
-        while not complete:
+    def async_execute(self, async_delay, resp, async_timeout=0):
+        """
+        wait for an async operation to complete
+        :param async_delay: maximum delay between status checks, in seconds
+        :param resp: response of the request that started the operation
+        :param async_timeout: seconds to wait for the operation before failing. 0 waits forever
+        :return: success, messages, duration, polling statistics
+        """
+        result = self.wait_async_operations([resp], async_delay, async_timeout)[0]
+        if 'success' not in result:
+            # status check failed or timed out
+            self.module.fail_json(**result)
+
+        return result['success'], result['messages'], result['duration'], dict(polls=result['polls'],
+                                                                               wait=result['wait'])
+
+    def wait_async_operations(self, operations, async_delay, async_timeout=0):
+        """
+        wait for several async operations in a single loop.
+        status checks of each operation start ASYNC_FIRST_DELAY apart and back off exponentially,
+        with jitter, up to async_delay
+        :param operations: responses of the requests that started the operations
+        :param async_delay: maximum delay between status checks, in seconds
+        :param async_timeout: seconds to wait for the operations. 0 waits forever
+        :return: result dict per operation, in the order of operations
+        """
+        start = time.time()
+        deadline = start + async_timeout if async_timeout else None
+        results = [None] * len(operations)
+        pending = {}
+
+        for index, resp in enumerate(operations):
+            if resp.get('complete'):
+                results[index] = _async_result(resp, 0, start)
+            else:
+                pending[index] = dict(uri=resp.get('uri'), polls=0, due=start)
+
+        while pending:
+            for index in sorted(pending, key=lambda i: pending[i]['due']):
+                operation = pending[index]
+                if operation['due'] > time.time():
+                    break
+
+                resp, info = self._http_get_request(url=operation['uri'], handle_errors=False, url_is_actual=True)
+                operation['polls'] += 1
+                if info.get('status', -1) != 200:
+                    results[index] = dict(failed=True, msg="workflow operation failed.", info=info,
+                                          polls=operation['polls'], resp=resp)
+                    del pending[index]
+                elif resp.get('complete'):
+                    results[index] = _async_result(resp, operation['polls'], start)
+                    del pending[index]
+                else:
+                    operation['uri'] = resp.get('uri')
+                    operation['due'] = time.time() + _poll_delay(operation['polls'] - 1, async_delay)
+                    if deadline:
+                        # last check right at the deadline
+                        operation['due'] = min(operation['due'], deadline)
+
+            if not pending:
+                break
+
+            if deadline and time.time() >= deadline:
+                for index, operation in pending.items():
+                    results[index] = dict(failed=True, uri=operation['uri'], polls=operation['polls'],
+                                          msg="workflow operation did not complete within %d seconds"
+                                              % async_timeout)
+                break
+
+            time.sleep(max(0, min(operation['due'] for operation in pending.values()) - time.time()))
+
+        return results
+
+    def get_async_status(self, uris, concurrency=10):
+        """
+        check the status of several async operations once, without waiting for them
+        :param uris: status uris returned when the operations were started
+        :param concurrency: maximum number of status checks at the same time
+        :return: result dict per operation, in the order of uris
+        """
+        def _status(uri):
             resp, info = self._http_get_request(url=uri, handle_errors=False, url_is_actual=True)
-            count += 1
             if info.get('status', -1) != 200:
-                self.module.fail_json(msg="workflow operation failed.", info=info, count=count, resp=resp)
+                return dict(failed=True, msg="status check failed.", info=info, uri=uri)
+            if not resp.get('complete'):
+                return dict(failed=False, complete=False, uri=uri)
+            return dict(_async_result(resp, 1, time.time()), complete=True, uri=uri)
+
+        return run_concurrently(_status, uris, concurrency)
+
+    def is_vdirect_uri(self, uri):
+        """
+        check that an async operation uri points to the vDirect HA pair, so credentials are not sent elsewhere
+        :param uri:
+        :return: boolean
+        """
+        parsed = urlparse.urlparse(uri)
+        return parsed.hostname in (self.endpoint_key[0], self.endpoint_key[1]) and parsed.port == self.port
+
+    def execute_workflow_operations(self, operations, sync, async_delay, async_timeout=0, concurrency=10,
+                                    check_mode=False):
+        """
+        start several workflow operations, then wait for all of them together
+        :param operations: list of dict(operation, workflow_name, action, workflow_template_name, parameters)
+        :param sync: when false, return once the operations were started
+        :param async_delay:
+        :param async_timeout:
+        :param concurrency: maximum number of operations started at the same time
+        :param check_mode: only validate the parameters of the operations
+        :return: result dict per operation, in the order of operations
+        """
+        def _submit(operation):
+            worker = self.worker()
+            try:
+                if check_mode:
+                    worker.check_workflow_operation(operation)
+                    return None
+                return worker.submit_workflow_operation(operation)
+            except vDirectError as ex:
+                return ex
+            except KeyError as kex:
+                return vDirectError(dict(msg="missing parameter %s" % kex))
+            except Exception as ex:
+                return vDirectError(dict(msg="%s" % ex))
+
+        results = [None] * len(operations)
+        started = []
+        for index, resp in enumerate(run_concurrently(_submit, operations, concurrency)):
+            if isinstance(resp, vDirectError):
+                results[index] = dict(resp.result, failed=True)
+            elif check_mode:
+                results[index] = dict(failed=False)
+            elif not sync:
+                results[index] = dict(failed=False, uri=resp.get('uri'), complete=resp.get('complete'))
             else:
-                complete = resp.get('complete')
-                uri = resp.get('uri')
-                if not complete:
-                    time.sleep(async_delay)
+                started.append((index, resp))
+
+        if started:
+            waited = self.wait_async_operations([resp for index, resp in started], async_delay, async_timeout)
+            for (index, resp), result in zip(started, waited):
+                results[index] = result
+
+        return results
+
+    def check_workflow_operation(self, operation):
+        """
+        validate the parameters of a create or action workflow operation with the parameter definition of the
+        workflow template or action
+        :param operation: dict(operation, workflow_name, action, workflow_template_name, parameters)
+        :return: converted parameters, with defaults
+        """
+        operation_type = operation.get('operation') or 'action'
+        params = operation.get('parameters') or {}
+
+        if operation_type == 'delete':
+            return params
+        if operation_type == 'create':
+            return self.check_params(self.get_workflow_params(operation['workflow_template_name']), params,
+                                     "workflow %s" % operation['workflow_name'])
+        return self.check_params(self.get_workflow_params(operation['workflow_name'], operation['action']), params,
+                                 "action %s of workflow %s" % (operation['action'], operation['workflow_name']))
+
+    def submit_workflow_operation(self, operation):
+        """
+        start a create, delete or action workflow operation, once its parameters are validated
+        :param operation: dict(operation, workflow_name, action, workflow_template_name, parameters)
+        :return: response of the async operation
+        """
+        operation_type = operation.get('operation') or 'action'
+        params = self.check_workflow_operation(operation)
+
+        if operation_type == 'delete':
+            return self.submit_delete_workflow(operation['workflow_name'])
+        if operation_type == 'create':
+            return self.submit_create_workflow(operation['workflow_template_name'], operation['workflow_name'],
+                                               params)
+        return self.submit_workflow_action(operation['workflow_name'], operation['action'], params)
+
+    def _get_definition(self, url):
+        """
+        GET a template or workflow parameter definition, at most once per module process.
+        definitions are kept in the controller cache as well, revalidated with their ETag when vDirect provides one,
+        and otherwise trusted for cache_ttl seconds. with coalesce, concurrent module processes share one request
+        :param url:
+        :return: resp, info. info status is 200 when the definition was found
+        """
+        key = self.endpoint_key + [url]
+        memo_key = json.dumps(key)
+        if memo_key in vDirect.definitions:
+            return vDirect.definitions[memo_key]['body'], dict(status=200, url=url)
+
+        cached = self.cache.get('definition', key)
+        if cached and not cached.get('etag') and self.cache.get('definition', key, self.cache_ttl):
+            vDirect.definitions[memo_key] = cached
+            return cached['body'], dict(status=200, url=url)
+
+        wait_start = time.time()
+        with self._coalesced('definition', key) as flight:
+            shared = flight.waited and self.cache.get('definition', key, time.time() - wait_start)
+            if shared:
+                # fetched or revalidated by another module process while this one waited
+                self.coalesced.append(time.time() - wait_start)
+                vDirect.definitions[memo_key] = shared
+                return shared['body'], dict(status=200, url=url)
+            return self._fetch_definition(url, key, memo_key, cached)
+
+    def _fetch_definition(self, url, key, memo_key, cached):
+        props = None
+        if cached and cached.get('etag'):
+            props = {'If-None-Match': cached['etag']}
+
+        resp, info = self._http_get_request(url, request_properties=props, handle_errors=False)
+        if info.get('status') == 304:
+            resp = cached['body']
+            info['status'] = 200
+            vDirect.definitions[memo_key] = cached
+            # refreshed, for the module processes waiting for it
+            self.cache.set('definition', key, cached)
+        elif info.get('status') == 200:
+            vDirect.definitions[memo_key] = dict(etag=info.get('etag'), body=resp)
+            self.cache.set('definition', key, vDirect.definitions[memo_key])
+        return resp, info
 
-        success = resp.get('success')
-        messages = resp.get('messages', [])
-        duration = resp.get('duration')
-        return success, messages, duration
+    def _compile_argument_spec(self, url, definition, compiler, *args):
+        """
+        ansible argument spec of a parameter definition fetched by _get_definition.
+        compiled specs are kept per module process, and in the controller cache per definition ETag
+        :param url: url of the definition
+        :param definition: definition returned by _get_definition
+        :param compiler: method mapping the definition to an argument spec
+        :param args: additional compiler arguments
+        :return: argument spec, a copy safe to modify
+        """
+        key = self.endpoint_key + [url, compiler.__name__] + list(args)
+        memo_key = json.dumps(key)
+        spec = vDirect.argument_specs.get(memo_key)
+        if spec is None:
+            etag = vDirect.definitions.get(json.dumps(self.endpoint_key + [url]), {}).get('etag')
+            cached = self.cache.get('argspec', key) if etag else None
+            if cached and cached.get('etag') == etag:
+                spec = cached['spec']
+            else:
+                spec = compiler(definition, *args)
+                if etag:
+                    self.cache.set('argspec', key, dict(etag=etag, spec=spec))
+            vDirect.argument_specs[memo_key] = spec
+        # callers change parameter specs (required) but not their values, a deep copy would cost more
+        # than compiling the spec again
+        return dict((name, dict(param)) for name, param in spec.items())
+
+    def check_params(self, argument_spec, params, subject):
+        """
+        validate parameters given outside the module arguments, such as per device or per operation parameters,
+        the way AnsibleModule validates its arguments: unknown and missing required parameters, defaults,
+        type conversion and choices
+        :param argument_spec: compiled parameter spec
+        :param params: dict, may hold None for parameters not given
+        :param subject: what the parameters belong to, for error messages
+        :return: converted parameters, with defaults
+        """
+        unknown = sorted(name for name in params if name not in argument_spec)
+        if unknown:
+            self.module.fail_json(msg="unsupported parameters for %s: %s" % (subject, ', '.join(unknown)))
+
+        # the functions AnsibleModule converts its own arguments with, by type name
+        checkers = self.module._CHECK_ARGUMENT_TYPES_DISPATCHER
+        checked = {}
+        missing = []
+        for name, spec in argument_spec.items():
+            value = params.get(name)
+            if value is None:
+                value = spec.get('default')
+            if value is None:
+                if spec.get('required'):
+                    missing.append(name)
+                continue
+
+            wanted = spec.get('type') or 'str'
+            try:
+                value = checkers[wanted](value)
+            except KeyError:
+                self.module.fail_json(msg="implementation error: unknown type %s requested for %s" % (wanted, name))
+            except (TypeError, ValueError):
+                self.module.fail_json(msg="parameter %s of %s is of type %s and we were unable to convert to %s" %
+                                      (name, subject, type(value), wanted))
+
+            choices = spec.get('choices')
+            if choices:
+                invalid = [item for item in (value if isinstance(value, list) else [value]) if item not in choices]
+                if invalid:
+                    self.module.fail_json(msg="value of parameter %s of %s must be one of: %s, got: %s" %
+                                          (name, subject, ', '.join(str(choice) for choice in choices),
+                                           ', '.join(str(item) for item in invalid)))
+            checked[name] = value
+
+        if missing:
+            self.module.fail_json(msg="missing required parameters for %s: %s" % (subject, ', '.join(sorted(missing))))
+        return checked
+
+    def invalidate_definitions(self, template_name=None):
+        """
+        forget cached parameter definitions after a template or workflow template upload
+        :param template_name: configuration template name. None drops all definitions,
+                              as workflow action definitions can not be matched to their workflow template
+        """
+        vDirect.argument_specs.clear()
+        if template_name is None:
+            vDirect.definitions.clear()
+            self.cache.clear('definition')
+        else:
+            key = self.endpoint_key + ["api/template/%s" % template_name]
+            vDirect.definitions.pop(json.dumps(key), None)
+            self.cache.invalidate('definition', key)
 
     def get_workflow_params(self, object_name, action_name='createWorkflow', raw=False):
         """
@@ -439,7 +2125,7 @@ class vDirect(object):
         else:
             url = "api/workflow/%s/action/%s" % (object_name, action_name)
 
-        resp, info = self._http_get_request(url, handle_errors=False)
+        resp, info = self._get_definition(url)
 
         status = info.get('status', -1)
 
@@ -457,17 +2143,15 @@ class vDirect(object):
         if raw:
             return resp
         else:
-            return self._map_wfcreate_params_to_args(resp)
+            return self._compile_argument_spec(url, resp, self._map_wfcreate_params_to_args)
 
-    def execute_workflow_action(self, workflow_name, action_name, params, sync, async_delay):
+    def submit_workflow_action(self, workflow_name, action_name, params):
         """
-        run workflow action
+        start workflow action
         :param workflow_name:
         :param action_name:
         :param params:
-        :param sync:
-        :param async_delay:
-        :return:
+        :return: response of the async operation
         """
         vdirect_params = self.get_workflow_params(workflow_name, action_name, raw=True)
 
@@ -487,23 +2171,19 @@ class vDirect(object):
                     msg_detail=msg)
 
             elif info.get('status') == 202:
-                if not sync:
-                    return False
-                return self.async_execute(async_delay, resp)
+                return resp
             else:
                 self._unknown_detailed_fail(info)
         else:
             self.module.fail_json(msg="http request handling failed", info=info, resp=resp)
 
-    def execute_create_workflow(self, workflow_template_name, workflow_name, params, sync, async_delay):
+    def submit_create_workflow(self, workflow_template_name, workflow_name, params):
         """
-        run createWorkflow action - creates a workflow from the template
+        start createWorkflow action
         :param workflow_template_name:
         :param workflow_name:
         :param params:
-        :param sync:
-        :param async_delay:
-        :return:
+        :return: response of the async operation
         """
         vdirect_params = self.get_workflow_params(workflow_template_name, raw=True)
 
@@ -523,9 +2203,7 @@ class vDirect(object):
                                       msg_detail=msg)
 
             elif info.get('status') == 202:
-                if not sync:
-                    return False
-                return self.async_execute(async_delay, resp)
+                return resp
             else:
                 self._unknown_detailed_fail(info)
         else:
@@ -566,19 +2244,66 @@ class vDirect(object):
         return resp, info
 
     # template methods
-    def find_template(self, template_name):
+    def list_templates(self):
+        """
+        names of the configuration templates on vDirect, in a single request
+        :return: set
+        """
+        return self._list_names("api/template")
+
+    def _list_names(self, url):
+        resp, info = self._http_get_request(url)
+        if isinstance(resp, dict):
+            # some vDirect versions wrap the list in an object
+            resp = [item for value in resp.values() if isinstance(value, list) for item in value]
+        try:
+            return set(item['name'] for item in resp)
+        except (TypeError, KeyError):
+            self.module.fail_json(msg="Unable to parse response", url=url, resp=resp)
+
+    def find_template(self, template_name, with_revision=False):
         """
         :param template_name:
-        :return: boolean
+        :param with_revision: also return the revision (ETag or Last-Modified) vDirect reports, None if it does not
+        :return: boolean, or (boolean, revision)
         """
         url = "api/template/%s" % template_name
-        return self._http_get_request_simple(url)
+        return self._http_get_request_simple(url, with_revision)
+
+    def uploaded_digest(self, kind, name, revision):
+        """
+        digest of the content last uploaded by the module, if vDirect still holds that content.
+        a recorded digest is trusted while the remote revision is unchanged. when vDirect reports no revision,
+        it is trusted for cache_ttl seconds
+        :param kind: template|workflowTemplate
+        :param name:
+        :param revision: current remote revision, see find_template
+        :return: hex digest or None
+        """
+        key = self.endpoint_key + [kind, name]
+        if revision:
+            entry = self.cache.get('upload', key)
+            if entry and entry.get('revision') == revision:
+                return entry['digest']
+            return None
+        entry = self.cache.get('upload', key, self.cache_ttl)
+        return entry['digest'] if entry else None
+
+    def record_upload(self, kind, name, digest, revision=None):
+        """
+        remember the digest of the content vDirect holds for a template
+        :param kind: template|workflowTemplate
+        :param name:
+        :param digest:
+        :param revision: remote revision of that content, if known
+        """
+        self.cache.set('upload', self.endpoint_key + [kind, name], dict(digest=digest, revision=revision))
 
     def update_template(self, template_name, template_file_data):
         """
         replace template source
         :param template_name:
-        :param template_file_data:
+        :param template_file_data: source or file object
         :return:
         """
         url = "api/template/%s/source?failIfInvalid=true" % template_name
@@ -588,13 +2313,14 @@ class vDirect(object):
 
         resp, info = self._http_put_request(url, template_file_data, props, False)
 
+        self.invalidate_definitions(template_name)
         return self._handle_template_response(info, resp)
 
     def upload_template(self, template_name, template_file_data):
         """
         create new template from source
         :param template_name:
-        :param template_file_data:
+        :param template_file_data: source or file object
         :return:
         """
         url = "api/template?name=%s&failIfInvalid=true" % template_name
@@ -604,6 +2330,7 @@ class vDirect(object):
 
         resp, info = self._http_post_request(url, template_file_data, props, False)
 
+        self.invalidate_definitions(template_name)
         return self._handle_template_response(info, resp)
 
     def validate_template(self, template_name, show_help=False):
@@ -614,7 +2341,9 @@ class vDirect(object):
         :return:
         """
         url = "api/template/%s" % template_name
-        resp, info = self._http_get_request(url)
+        resp, info = self._get_definition(url)
+        if info.get('status') != 200:
+            self._unknown_detailed_fail(info)
 
         try:
             if not resp['valid']:
@@ -631,7 +2360,7 @@ class vDirect(object):
                 if template_device_type != self.device_type and not show_help:
                     self.module.fail_json(msg="Device type mismatch", info=resp['info'], device_user=self.device_type,
                                           device_template=template_device_type)
-                params = self._map_params_to_args(resp, show_help)
+                params = self._compile_argument_spec(url, resp, self._map_params_to_args, bool(show_help))
 
                 if show_help:
                     params['device_type'] = template_device_type
@@ -640,65 +2369,153 @@ class vDirect(object):
         except (IndexError, KeyError):
             self.module.fail_json(msg="Unable to parse response", info=resp['info'])
 
-    def download_template(self, template_name):
+    def download_template_digest(self, template_name):
         """
-        get template source
+        sha256 of the template source, computed while streaming the download
         :param template_name:
-        :return:
+        :return: hex digest
         """
         url = "api/template/%s/source" % template_name
         resp, info = self._http_get_request(url, response_is_json=False)
+        digest = hashlib.sha256()
         if resp:
-            resp = resp.read()
-        return resp
+            _update_digest(digest, resp)
+        return digest.hexdigest()
 
-    def execute_template(self, template_name, template_args, check_mode):
+    def execute_template(self, template_name, template_args, check_mode, change_detection='full', dry_run_ttl=0):
         """
 
         :param template_name:
         :param template_args:
         :param check_mode:
+        :param change_detection: full|digest
+        :param dry_run_ttl: seconds a dry run result is reused for the same template revision, device and parameters.
+                            0 always runs the dry run on vDirect
         :return: template output parameters
         """
         method = self._get_method("execute_template")
-        return method(template_name, template_args, check_mode)
-
-    def diff(self):
+        return method(template_name, template_args, check_mode, change_detection, dry_run_ttl)
 
+    def execute_template_batch(self, template_name, devices, check_mode, change_detection='full',
+                               commit_changes=False, concurrency=10, dry_run_ttl=0):
+        """
+        execute a validated template on several devices concurrently
+        :param template_name:
+        :param devices: list of (device_name, template_args)
+        :param check_mode:
+        :param change_detection:
+        :param commit_changes:
+        :param concurrency: maximum number of devices handled at the same time
+        :param dry_run_ttl: see execute_template
+        :return: dict of device name to (resp, data, changed, duration) or vDirectError
+        """
+        def _execute(device):
+            device_name, template_args = device
+            worker = self.for_device(device_name)
+            start = time.time()
+            try:
+                resp, info, data, changed = worker.execute_template(template_name, template_args, check_mode,
+                                                                    change_detection, dry_run_ttl)
+                if not check_mode and commit_changes:
+                    changed = worker.commit()
+                return resp, data, changed, time.time() - start
+            except vDirectError as ex:
+                ex.result['duration'] = time.time() - start
+                return ex
+            except Exception as ex:
+                return vDirectError(dict(msg="%s" % ex, duration=time.time() - start))
+
+        results = run_concurrently(_execute, devices, concurrency)
+        return dict((device[0], result) for device, result in zip(devices, results))
+
+    def diff(self, digest=False):
+        """
+        pending configuration changes on the device
+        :param digest: when true, return a sha256 digest of the changes instead of the changes
+        :return:
+        """
         method = self._get_method("diff")
-        return method()
+        return method(digest)
 
-    def commit(self):
+    def commit(self, skip_if_clean=False, check_mode=False):
         """
         apply + save of uncommitted changes
-        :return: boolean
+        :param skip_if_clean: do not commit when the device reports no pending changes
+        :param check_mode: only tell whether a commit would commit changes
+        :return: boolean, None in check mode when the device type can not tell
         """
+        if skip_if_clean or check_mode:
+            pending = self.commit_needed()
+            if check_mode:
+                return pending
+            if pending is False:
+                return False
         method = self._get_method("commit")
         return method()
 
-    def _execute_template_alteon(self, template_name, template_args, check_mode):
+    def commit_needed(self):
+        """
+        whether the device has pending changes, without committing them
+        :return: boolean, None when the device type can not tell
+        """
+        method = self._get_method("commit_needed")
+        return method()
+
+    def commit_batch(self, devices, concurrency=10, skip_if_clean=False, check_mode=False):
+        """
+        commit several devices concurrently
+        :param devices: list of (device_name, device_type)
+        :param concurrency: maximum number of devices committed at the same time
+        :param skip_if_clean: see commit
+        :param check_mode: see commit
+        :return: dict of device name to (commit_needed, duration) or vDirectError
+        """
+        def _commit(device):
+            device_name, device_type = device
+            worker = self.for_device(device_name, device_type)
+            start = time.time()
+            try:
+                return worker.commit(skip_if_clean, check_mode), time.time() - start
+            except vDirectError as ex:
+                ex.result['duration'] = time.time() - start
+                return ex
+            except Exception as ex:
+                return vDirectError(dict(msg="%s" % ex, duration=time.time() - start))
+
+        results = run_concurrently(_commit, devices, concurrency)
+        return dict((device[0], result) for device, result in zip(devices, results))
+
+    def _execute_template_alteon(self, template_name, template_args, check_mode, change_detection, dry_run_ttl):
 
-        diff_before = self.diff()
+        if check_mode:
+            # a dry run never changes the device configuration
+            resp, info, data = self._execute_template(template_name, template_args, self.device_parameter_name, True,
+                                                      dry_run_ttl)
+            return resp, info, data, False
+
+        digest = change_detection == 'digest'
+        diff_before = self.diff(digest)
         resp, info, data = self._execute_template(template_name, template_args, self.device_parameter_name, check_mode)
-        diff_after = self.diff()
+        diff_after = self.diff(digest)
         changed = diff_before != diff_after
 
         return resp, info, data, changed
 
-    def _execute_template_defensepro(self, template_name, template_args, check_mode):
+    def _execute_template_defensepro(self, template_name, template_args, check_mode, change_detection, dry_run_ttl):
 
         return self._execute_template(
             template_name,
             template_args,
             self.device_parameter_name,
-            check_mode
+            check_mode,
+            dry_run_ttl
         ) + (not check_mode,)
 
-    def _execute_template_appwall(self, template_name, template_args, check_mode):
+    def _execute_template_appwall(self, template_name, template_args, check_mode, change_detection, dry_run_ttl):
 
         self.module.fail_json(msg="AppWall no supported in template module")
 
-    def _execute_template(self, template_name, template_args, device_arg, check_mode):
+    def _execute_template(self, template_name, template_args, device_arg, check_mode, dry_run_ttl=0):
 
         url = "api/template/" + template_name
         props = {
@@ -716,13 +2533,37 @@ class vDirect(object):
             }
         }
 
+        dry_run_key = None
         if check_mode:
             data['dryRun'] = True
+            if dry_run_ttl:
+                dry_run_key = self._dry_run_key(template_name, data)
+            if dry_run_key:
+                cached = self.cache.get('dryrun', dry_run_key, dry_run_ttl)
+                if cached is not None:
+                    return cached, dict(status=200, url=url, cached=True), data
 
         resp, info = self._http_post_request(url, data=json.dumps(data), request_properties=props)
 
+        if dry_run_key:
+            self.cache.set('dryrun', dry_run_key, resp)
         return resp, info, data
 
+    def _dry_run_key(self, template_name, data):
+        """
+        controller cache key of a dry run - the template revision, the device and the request,
+        without the parameters left unset
+        :param template_name: a template validated by this module process
+        :param data: dry run request
+        :return: key, None when vDirect did not report the template revision
+        """
+        definition = vDirect.definitions.get(json.dumps(self.endpoint_key + ["api/template/%s" % template_name]))
+        if not definition or not definition.get('etag'):
+            return None
+        parameters = dict((name, value) for name, value in data['parameters'].items() if value is not None)
+        return self.endpoint_key + [template_name, definition['etag'], self.device_type,
+                                    dict(data, parameters=parameters)]
+
 
     def _commit_alteon(self):
 
@@ -739,6 +2580,19 @@ class vDirect(object):
         uri = "api/appWall/%s/device?action=commit"
         return self._commit(uri)
 
+    def _commit_needed_alteon(self):
+
+        # the digest is compared, the diff is streamed and not downloaded again while unchanged
+        return self.diff(True) != EMPTY_DIFF_DIGEST
+
+    def _commit_needed_defensepro(self):
+
+        return None
+
+    def _commit_needed_appwall(self):
+
+        return None
+
     def _commit(self, uri):
 
         url = uri % self.device_name
@@ -746,31 +2600,66 @@ class vDirect(object):
         if 'status' in info:
             if info['status'] == 200:
                 changed = resp['commitNeeded']
+                # the ETag of the diff before the commit is stale
+                self.cache.invalidate('diff', self._device_key())
                 return changed
             else:
                 self._unknown_detailed_fail(info)
         self.module.fail_json(msg="http request handling failed", info=info, resp=resp)
 
-    def _diff_alteon(self):
+    def _diff_alteon(self, digest):
 
         uri = "api/adc/%s/config?diff=cur"
-        return self._diff(uri)
+        return self._diff(uri, digest)
 
-    def _diff_defensepro(self):
+    def _diff_defensepro(self, digest):
 
         self.module.fail_json(msg="diff unsupported for this device type")
 
-    def _diff_appwall(self):
+    def _diff_appwall(self, digest):
 
         self.module.fail_json(msg="diff unsupported for this device type")
 
-    def _diff(self, uri):
+    def _diff(self, uri, digest=False):
 
         url = uri % self.device_name
+        if digest:
+            return self._diff_digest(url)
+
         resp, info = self._http_get_request(url=url, response_is_json=False)
-        resp = resp.read()
+        # compared like the digests, without leading and trailing whitespace
+        resp = resp.read().strip()
         return resp
 
+    def _device_key(self):
+        return self.endpoint_key + [self.device_type, self.device_name]
+
+    def _diff_digest(self, url):
+        """
+        sha256 of the pending changes, computed while streaming the diff. leading and trailing whitespace is left out,
+        so a device without pending changes has EMPTY_DIFF_DIGEST even when the diff holds line breaks.
+        the ETag of the last diff is sent along so an unchanged diff is not downloaded again
+        """
+        state = self.cache.get('diff', self._device_key())
+        props = None
+        if state and state.get('etag'):
+            props = {'If-None-Match': state['etag']}
+
+        resp, info = self._http_get_request(url=url, request_properties=props, handle_errors=False,
+                                            response_is_json=False)
+        status = info.get('status')
+        if status == 304:
+            return state['digest']
+        if status != 200:
+            self._unknown_detailed_fail(info)
+
+        digest = hashlib.sha256()
+        _update_stripped_digest(digest, resp)
+        digest = digest.hexdigest()
+
+        self.cache.set('diff', self._device_key(), dict(digest=digest, etag=info.get('etag')))
+        return digest
+
     def _map_wfcreate_params_to_args(self, api_resp):
 
         try:
@@ -785,27 +2674,7 @@ class vDirect(object):
 
             for param in api_resp.get('properties', []):
                 if 'direction' not in param or param['direction'] in ['in', 'inout']:
-                    params[param['name']] = {}
-
-                    new_param = params[param['name']]
-                    if param['type'] not in ALLOWED_PARAM_TYPES:
-                        if param['type'].endswith('[]'):
-                            new_param['type'] = 'list'
-                        else:
-                            new_param['type'] = 'dict'
-                    elif param['type'] in STRING_PARAM_TYPES:
-                        new_param['type'] = 'str'
-                    else:
-                        _copy_param_to_dict(param, new_param, 'type')
-
-                    if 'defaultValue' in param:
-                        new_param['default'] = param['defaultValue']
-                        new_param['required'] = False
-                    else:
-                        new_param['required'] = True
-
-                    if 'values' in param:
-                        new_param['choices'] = param['values']
+                    params[param['name']] = _map_param_to_arg(param)
 
             return params
         except KeyError as kex:
@@ -818,47 +2687,283 @@ class vDirect(object):
             if 'parameters' not in api_resp['info']:
                 return new_params
 
-            params = api_resp['info']['parameters']
-            for param in params:
-                if 'direction' not in param or param['direction'] in ['in', 'inout']:
-                    new_params[param['name']] = {}
-                    new_param = new_params[param['name']]
-                    if param['type'] not in ALLOWED_PARAM_TYPES:
-                        if param['type'].endswith('[]'):
-                            new_param['type'] = 'list'
-                        else:
-                            new_param['type'] = 'dict'
-                    elif param['type'] in STRING_PARAM_TYPES:
-                        new_param['type'] = 'str'
-                    else:
-                        _copy_param_to_dict(param, new_param, 'type')
-
-                    if 'defaultValue' in param:
-                        new_param['default'] = param['defaultValue']
-                        new_param['required'] = False
-                    else:
-                        new_param['required'] = True
-
-                    if 'values' in param:
-                        new_param['choices'] = param['values']
-
-                    if with_help:
-                        for key in ('prompt', 'pattern', 'separator', 'min', 'max', 'maxCharLength', 'minCharLength'):
-                            _copy_param_to_dict(param, new_param, key)
+            user_types = None
             if with_help:
-                for par in new_params:
-                    if new_params[par]['type'] == 'dict':
-                        for old_param in api_resp['info']['parameters']:
-                            if old_param['name'] == par:
-                                for utype in api_resp['info']['userTypes']:
-                                    if utype['name'] == old_param['type']:
-                                        new_params[par]['definition'] = utype['fields']
+                user_types = _UserTypes(api_resp['info'].get('userTypes', []))
+
+            for param in api_resp['info']['parameters']:
+                if 'direction' not in param or param['direction'] in ['in', 'inout']:
+                    new_params[param['name']] = _map_param_to_arg(param, user_types)
 
             return new_params
         except KeyError as kex:
             self.module.fail_json(msg="Error parsing response", e=kex.message)
 
 
+EMPTY_DIFF_DIGEST = hashlib.sha256().hexdigest() if HAS_LIBS else ""
+
+
+def _revision(info):
+    """
+    revision of a vDirect resource taken from the response headers
+    :param info:
+    :return: ETag or Last-Modified, None when vDirect sent neither
+    """
+    return info.get('etag') or info.get('last-modified')
+
+
+def _connection_refused(info):
+    """
+    whether a request failed because vDirect refused the connection, so it was never sent
+    :param info:
+    :return: boolean
+    """
+    return info.get('status') == -1 and ("[Errno %d]" % errno.ECONNREFUSED) in str(info.get('msg', ''))
+
+
+def _proxied(url):
+    """
+    whether a proxy of the environment (http_proxy, https_proxy and no_proxy) applies to a url
+    :param url:
+    :return: boolean
+    """
+    parsed = urlparse.urlparse(url)
+    return parsed.scheme in getproxies() and not proxy_bypass(parsed.hostname)
+
+
+def _session_cookie(set_cookie):
+    """
+    :param set_cookie: Set-Cookie header of a response, several cookies are comma separated
+    :return: "name=value" of the vDirect session cookie, None when the response does not set it
+    """
+    if not set_cookie:
+        return None
+    for cookie in set_cookie.split(','):
+        name, _, value = cookie.split(';')[0].strip().partition('=')
+        if name == SESSION_COOKIE and value:
+            return "%s=%s" % (name, value)
+    return None
+
+
+def _url_template(url):
+    """
+    path and query of a vDirect url, with object names replaced by placeholders
+    :param url: actual url
+    :return: e.g. api/template/{name}/source
+    """
+    parsed = urlparse.urlparse(url)
+    segments = parsed.path.strip('/').split('/')
+    if len(segments) > 2 and segments[0] == 'api':
+        if segments[1] == 'runnable':
+            segments[2:] = ['{id}']
+        elif segments[1] in URL_OBJECT_TYPES:
+            segments[2] = '{name}'
+    if len(segments) > 4 and segments[3] == 'action':
+        segments[4] = '{action}'
+
+    template = '/'.join(segments)
+    if parsed.query:
+        template += '?' + '&'.join('name={name}' if param.startswith('name=') else param
+                                   for param in parsed.query.split('&'))
+    return template
+
+
+def _round_timing(timing):
+    """
+    timing record as reported in the module result, durations rounded to 0.1 ms
+    """
+    return dict((key, round(value, 4) if key in ('dns', 'connect', 'tls', 'ttfb', 'total', 'queued') else value)
+                for key, value in timing.items() if key != 'start')
+
+
+class _WorkflowXmlReader(object):
+    """
+    expat handlers collecting the metadata of a workflow.xml.
+    elements are tracked by their path of local names (namespace prefixes dropped) from the root
+    """
+
+    class Done(Exception):
+        pass
+
+    def __init__(self):
+        self.path = []
+        self.metadata = {}
+
+    def parse(self, stream):
+        parser = expat.ParserCreate()
+        parser.StartElementHandler = self._start
+        parser.EndElementHandler = self._end
+        try:
+            chunk = stream.read(CHUNK_SIZE)
+            while chunk:
+                parser.Parse(chunk, False)
+                chunk = stream.read(CHUNK_SIZE)
+            parser.Parse(b'', True)
+        except _WorkflowXmlReader.Done:
+            pass
+
+    def _start(self, tag, attributes):
+        tag = tag.split(':')[-1]
+        path = self.path
+        if not path:
+            if tag == 'workflow':
+                self.metadata['name'] = str(attributes.get('name', '').encode('ascii', 'ignore').decode('ascii'))
+            if tag != 'workflow':
+                raise _WorkflowXmlReader.Done()
+            self.metadata.update(createAction=attributes.get('createAction'),
+                                 deleteAction=attributes.get('deleteAction'), parameters=[], actions=[])
+        elif path == ['workflow', 'persist', 'parameters'] and tag == 'parameter':
+            self.metadata['parameters'].append(dict(name=attributes.get('name'), type=attributes.get('type')))
+        elif path == ['workflow', 'actions'] and tag == 'action':
+            self.metadata['actions'].append(dict(name=attributes.get('name'),
+                                                 visible=attributes.get('visible', 'true') != 'false', inputs=[]))
+        elif path == ['workflow', 'actions', 'action', 'inputs', 'parameters'] and tag == 'parameter':
+            self.metadata['actions'][-1]['inputs'].append(attributes.get('name'))
+        path.append(tag)
+
+    def _end(self, tag):
+        self.path.pop()
+        if self.path == ['workflow'] and tag.split(':')[-1] == 'actions':
+            # nothing after the actions is collected
+            raise _WorkflowXmlReader.Done()
+
+
+def _members_digest(members):
+    """
+    :param members: sorted (name, hex digest) of the files of an archive
+    :return: hex digest
+    """
+    digest = hashlib.sha256()
+    for name, member_digest in members:
+        digest.update(("%s\0%s\n" % (name, member_digest)).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _archive_file(archive, path, name):
+    """
+    add a file to a zip archive being written, CHUNK_SIZE bytes at a time, with the fixed timestamp
+    ARCHIVE_DATE_TIME and fixed permissions
+    :param archive: ZipFile
+    :param path: file to add
+    :param name: entry name
+    :return: hex sha256 of the file content
+    """
+    entry = zipfile.ZipInfo(name, date_time=ARCHIVE_DATE_TIME)
+    entry.compress_type = zipfile.ZIP_DEFLATED
+    entry.create_system = 3
+    entry.external_attr = 0o644 << 16
+    # decides whether the entry needs zip64 extensions
+    entry.file_size = os.path.getsize(path)
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as source:
+        try:
+            target = archive.open(entry, 'w')
+        except RuntimeError:
+            # ZipFile entries can not be opened for writing before python 3.6
+            target = None
+        if target is not None:
+            try:
+                chunk = source.read(CHUNK_SIZE)
+                while chunk:
+                    digest.update(chunk)
+                    target.write(chunk)
+                    chunk = source.read(CHUNK_SIZE)
+            finally:
+                target.close()
+            return digest.hexdigest()
+        _update_digest(digest, source)
+
+    # ZipFile.write streams the file too, but takes the timestamp and permissions of the file.
+    # the entry gets the fixed ones here, the local header timestamp is fixed by _fix_archive_times
+    archive.write(path, name)
+    written = archive.getinfo(name)
+    written.date_time = ARCHIVE_DATE_TIME
+    written.create_system = entry.create_system
+    written.external_attr = entry.external_attr
+    return digest.hexdigest()
+
+
+def _fix_archive_times(archive_data, entries):
+    """
+    write the timestamp of every entry into its local header, once the archive is closed
+    :param archive_data: file object of the archive
+    :param entries: ZipInfo of the entries
+    """
+    for entry in entries:
+        date_time = entry.date_time
+        dos_time = date_time[3] << 11 | date_time[4] << 5 | date_time[5] // 2
+        dos_date = (date_time[0] - 1980) << 9 | date_time[1] << 5 | date_time[2]
+        # the modification time and date follow the signature, version, flags and compression method
+        archive_data.seek(entry.header_offset + 10)
+        archive_data.write(struct.pack('<HH', dos_time, dos_date))
+
+
+def _stream_size(stream):
+    """
+    size of a seekable file object, which is left at its start
+    """
+    stream.seek(0, os.SEEK_END)
+    size = stream.tell()
+    stream.seek(0)
+    return size
+
+
+def _update_digest(digest, stream):
+    """
+    feed a file like object to a hashlib digest, CHUNK_SIZE bytes at a time
+    """
+    chunk = stream.read(CHUNK_SIZE)
+    while chunk:
+        digest.update(chunk)
+        chunk = stream.read(CHUNK_SIZE)
+
+
+def _update_stripped_digest(digest, stream):
+    """
+    feed a file like object to a hashlib digest like _update_digest, without its leading and trailing whitespace
+    """
+    started = False
+    # whitespace read after the last content, fed once more content follows
+    pending = b''
+    chunk = stream.read(CHUNK_SIZE)
+    while chunk:
+        if not started:
+            chunk = chunk.lstrip()
+            started = bool(chunk)
+        content = chunk.rstrip()
+        if content:
+            digest.update(pending + content)
+            pending = chunk[len(content):]
+        else:
+            pending += chunk
+        chunk = stream.read(CHUNK_SIZE)
+
+
+def _async_result(resp, polls, start):
+
+    return dict(
+        failed=not resp.get('success'),
+        success=resp.get('success'),
+        messages=resp.get('messages', []),
+        duration=resp.get('duration'),
+        polls=polls,
+        wait=round(time.time() - start, 3)
+    )
+
+
+def _poll_delay(poll_count, max_delay):
+    """
+    delay before the next status check of an async operation
+    :param poll_count: status checks done so far, minus one
+    :param max_delay:
+    :return: seconds
+    """
+    delay = min(max_delay, ASYNC_FIRST_DELAY * 2 ** min(poll_count, 16))
+    # jitter keeps the checks of operations started together from hitting vDirect at the same time
+    return random.uniform(delay / 2.0, delay)
+
+
 def _format_rest_response(resp):
 
     try:
@@ -869,6 +2974,80 @@ def _format_rest_response(resp):
         return None
 
 
+def _map_param_to_arg(param, user_types=None):
+    """
+    ansible argument spec of a template or workflow parameter
+    :param param: parameter definition returned by vDirect
+    :param user_types: _UserTypes of the template. when given, the spec includes the help information,
+                       with the fields of user type parameters
+    :return: dict
+    """
+    new_param = {}
+    if param['type'] not in ALLOWED_PARAM_TYPES:
+        if param['type'].endswith('[]'):
+            new_param['type'] = 'list'
+        else:
+            new_param['type'] = 'dict'
+    elif param['type'] in STRING_PARAM_TYPES:
+        new_param['type'] = 'str'
+    else:
+        _copy_param_to_dict(param, new_param, 'type')
+
+    if 'defaultValue' in param:
+        new_param['default'] = param['defaultValue']
+        new_param['required'] = False
+    else:
+        new_param['required'] = True
+
+    if 'values' in param:
+        new_param['choices'] = param['values']
+
+    if user_types is not None:
+        for key in ('prompt', 'pattern', 'separator', 'min', 'max', 'maxCharLength', 'minCharLength'):
+            _copy_param_to_dict(param, new_param, key)
+        if new_param['type'] == 'dict' and param['type'] in user_types:
+            new_param['definition'] = user_types.fields(param['type'])
+
+    return new_param
+
+
+class _UserTypes(object):
+    """
+    user types of a template, indexed by name.
+    the fields of every user type are resolved once, fields of a nested user type get its fields as definition
+    """
+
+    def __init__(self, user_types):
+        self.types = dict((utype['name'], utype) for utype in user_types)
+        self.resolved = {}
+        self.resolving = set()
+
+    def __contains__(self, type_name):
+        return type_name in self.types
+
+    def fields(self, type_name):
+        """
+        :param type_name:
+        :return: list of field definitions. a user type nested in itself is not expanded again
+        """
+        if type_name in self.resolved:
+            return self.resolved[type_name]
+
+        self.resolving.add(type_name)
+        fields = []
+        for field in self.types[type_name].get('fields', []):
+            field_type = field.get('type', '')
+            if field_type.endswith('[]'):
+                field_type = field_type[:-2]
+            if field_type in self.types and field_type not in self.resolving:
+                field = dict(field, definition=self.fields(field_type))
+            fields.append(field)
+        self.resolving.discard(type_name)
+
+        self.resolved[type_name] = fields
+        return fields
+
+
 def _copy_param_to_dict(src_dict, dst_dict, key_name, new_key_name=None):
 
     if key_name in src_dict: